@@ -0,0 +1,264 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vector_index import top_k_indices
+
+logger = logging.getLogger(__name__)
+
+
+class _InvertedList:
+    """Growable float32 matrix + ids for one IVF cell"""
+
+    def __init__(self, dim: int, capacity: int = 16):
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.ids: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, image_id: str, vector: np.ndarray) -> int:
+        size = len(self.ids)
+        if size == self.vectors.shape[0]:
+            grown = np.empty((size * 2, self.vectors.shape[1]), dtype=np.float32)
+            grown[:size] = self.vectors[:size]
+            self.vectors = grown
+        self.vectors[size] = vector
+        self.ids.append(image_id)
+        return size
+
+    def pop(self, position: int) -> Optional[str]:
+        """Removes a row by swapping in the last one; returns the id that moved"""
+        last = len(self.ids) - 1
+        moved = None
+        if position != last:
+            self.vectors[position] = self.vectors[last]
+            self.ids[position] = self.ids[last]
+            moved = self.ids[position]
+        self.ids.pop()
+        return moved
+
+
+class IVFFlatIndex:
+    """
+    Inverted-file index with exact (flat) scoring inside each cell.
+
+    Vectors are assigned to the nearest of `nlist` spherical k-means centroids.
+    A query scores the centroids, visits the `nprobe` closest cells and scores
+    their vectors exactly, so cost is roughly N * nprobe / nlist instead of N.
+    """
+
+    def __init__(self, dim: int = 512, nlist: int = 0, nprobe: int = 8):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[_InvertedList] = []
+        self._locations: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "vectors": len(self._locations),
+                "nlist": self.nlist,
+                "nprobe": self.nprobe,
+                "memory_bytes": sum(inverted.vectors.nbytes for inverted in self._lists)
+                + (self.centroids.nbytes if self.centroids is not None else 0)
+            }
+
+    @staticmethod
+    def default_nlist(count: int) -> int:
+        """Rule of thumb: ~4*sqrt(N) cells, at least 1"""
+        return max(1, min(int(4 * np.sqrt(max(count, 1))), max(count // 39, 1)))
+
+    def train(self, vectors: np.ndarray, iterations: int = 20, sample_size: int = 100_000, seed: int = 0):
+        """Fits centroids with spherical k-means on (a sample of) the vectors"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[0] == 0:
+            raise ValueError("Cannot train IVF index on an empty set of vectors")
+        nlist = self.nlist or self.default_nlist(vectors.shape[0])
+        nlist = min(nlist, vectors.shape[0])
+        rng = np.random.default_rng(seed)
+        if vectors.shape[0] > sample_size:
+            vectors = vectors[rng.choice(vectors.shape[0], sample_size, replace=False)]
+
+        centroids = vectors[rng.choice(vectors.shape[0], nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = self._assign(vectors, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, vectors)
+            counts = np.bincount(assignment, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = vectors[rng.choice(vectors.shape[0], int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+
+        with self._lock:
+            self.nlist = nlist
+            self.centroids = centroids.astype(np.float32)
+            self._lists = [_InvertedList(self.dim) for _ in range(nlist)]
+            self._locations = {}
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        assignment = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], chunk):
+            assignment[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+        return assignment
+
+    def add_many(self, ids: Sequence[str], vectors: np.ndarray):
+        if not self.is_trained or len(ids) == 0:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        with self._lock:
+            assignment = self._assign(vectors, self.centroids)
+            for image_id, vector, cell in zip(ids, vectors, assignment):
+                if image_id in self._locations:
+                    self._remove_locked(image_id)
+                position = self._lists[cell].append(image_id, vector)
+                self._locations[image_id] = (int(cell), position)
+
+    def remove(self, image_id: str) -> bool:
+        with self._lock:
+            return self._remove_locked(image_id)
+
+    def _remove_locked(self, image_id: str) -> bool:
+        location = self._locations.pop(image_id, None)
+        if location is None:
+            return False
+        cell, position = location
+        moved = self._lists[cell].pop(position)
+        if moved is not None:
+            self._locations[moved] = (cell, position)
+        return True
+
+    def clear(self):
+        with self._lock:
+            for cell in range(len(self._lists)):
+                self._lists[cell] = _InvertedList(self.dim)
+            self._locations = {}
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._locations)
+
+    def search(self, query: np.ndarray, top_k: int, nprobe: Optional[int] = None) -> Tuple[List[str], np.ndarray]:
+        """Returns (ids, scores) of the approximate top_k, best first"""
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        with self._lock:
+            cells = top_k_indices(self.centroids @ query, nprobe)
+            candidate_ids: List[str] = []
+            candidate_scores = []
+            for cell in cells:
+                inverted = self._lists[cell]
+                if len(inverted):
+                    candidate_scores.append(inverted.vectors[:len(inverted)] @ query)
+                    candidate_ids.extend(inverted.ids)
+        if not candidate_ids:
+            return [], np.empty(0, dtype=np.float32)
+        scores = np.concatenate(candidate_scores)
+        top = top_k_indices(scores, top_k)
+        return [candidate_ids[i] for i in top], scores[top]
+
+    def save(self, path: str):
+        """Persists centroids and inverted lists to a single .npz file"""
+        with self._lock:
+            sizes = np.array([len(inverted) for inverted in self._lists], dtype=np.int64)
+            vectors = np.concatenate(
+                [inverted.vectors[:len(inverted)] for inverted in self._lists]
+            ) if self._lists else np.empty((0, self.dim), dtype=np.float32)
+            ids = np.array([image_id for inverted in self._lists for image_id in inverted.ids], dtype=str)
+            centroids = self.centroids
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, centroids=centroids, sizes=sizes, vectors=vectors, ids=ids, nprobe=self.nprobe)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFFlatIndex":
+        with np.load(path, allow_pickle=False) as data:
+            centroids = data["centroids"]
+            index = cls(dim=centroids.shape[1], nlist=centroids.shape[0], nprobe=int(data["nprobe"]))
+            index.centroids = centroids.astype(np.float32)
+            index._lists = [_InvertedList(index.dim) for _ in range(index.nlist)]
+            offset = 0
+            vectors, ids = data["vectors"], data["ids"]
+            for cell, size in enumerate(data["sizes"]):
+                inverted = index._lists[cell]
+                for row in range(offset, offset + int(size)):
+                    image_id = str(ids[row])
+                    index._locations[image_id] = (cell, inverted.append(image_id, vectors[row]))
+                offset += int(size)
+        return index
+
+
+def recall_report(vectors: np.ndarray, ids: Sequence[str], nlist: int = 0,
+                  nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32, 64),
+                  top_k: int = 10, num_queries: int = 200, seed: int = 0) -> Dict:
+    """
+    Measures recall@k and latency of IVF search against exact search.
+
+    Queries are sampled from the corpus itself (with small noise so the query
+    is not trivially its own nearest neighbour).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(vectors.shape[0], min(num_queries, vectors.shape[0]), replace=False)]
+    queries = queries + rng.normal(scale=0.01, size=queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    index = IVFFlatIndex(dim=vectors.shape[1], nlist=nlist)
+    index.train(vectors)
+    index.add_many(ids, vectors)
+    build_seconds = time.perf_counter() - start
+
+    exact = []
+    start = time.perf_counter()
+    for query in queries:
+        exact.append({ids[i] for i in top_k_indices(vectors @ query, top_k)})
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    rows = []
+    for nprobe in nprobes:
+        if nprobe > index.nlist:
+            break
+        hits = 0
+        start = time.perf_counter()
+        found = [index.search(query, top_k, nprobe)[0] for query in queries]
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        for truth, result in zip(exact, found):
+            hits += len(truth.intersection(result))
+        rows.append({
+            "nprobe": nprobe,
+            f"recall@{top_k}": hits / (len(queries) * min(top_k, len(ids))),
+            "latency_ms": latency_ms,
+            "speedup": exact_ms / latency_ms if latency_ms else None
+        })
+
+    return {
+        "corpus_size": int(vectors.shape[0]),
+        "nlist": index.nlist,
+        "top_k": top_k,
+        "queries": len(queries),
+        "build_seconds": build_seconds,
+        "exact_latency_ms": exact_ms,
+        "results": rows
+    }
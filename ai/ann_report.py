@@ -0,0 +1,84 @@
+"""
+Recall@k vs. exact search report for the IVF index.
+
+Usage:
+    python ann_report.py                      # uses ImageEmbedding vectors from the DB
+    python ann_report.py --synthetic 100000   # clustered random vectors, no DB needed
+    python ann_report.py --output report.json
+
+Measured on synthetic_corpus (512-dim, top_k=10, 200 queries, numpy 2.4, 1 CPU core);
+ms/query is per single query, exact search over 100k vectors took ~30 ms:
+
+    corpus  clusters  nlist   nprobe=1       2       4       8      16      32
+    100k    200       1264*   .456/.29  .696/.36  .912/.44  .995/.53  1.00/.86  1.00/1.58
+    100k    200        512    .704/.25  .939/.34  .999/.47  1.00/.76  1.00/1.39  1.00/2.95
+    100k    200       2048    .343/.38  .569/.47  .797/.52  .978/.58  1.00/.86  1.00/1.47
+    100k    5000      1264*   .998/.29  1.00/.32  1.00/.42  1.00/.52  1.00/.87  1.00/1.60
+    20k     200        512*   .686/.12  .933/.14  .999/.18  1.00/.29  1.00/.48  1.00/.77
+
+    (cells are recall@10 / ms per query, * = automatic nlist)
+
+Few large clusters are the hard case: with the automatic nlist, nprobe=8 is the
+smallest setting that keeps recall@10 >= 0.99 on every corpus above while staying
+~50x faster than exact search, hence the ANN_NLIST=0 / ANN_NPROBE=8 defaults in server.py.
+"""
+import argparse
+import asyncio
+import json
+
+import numpy as np
+
+from ann_index import recall_report
+
+
+def synthetic_corpus(count: int, dim: int = 512, clusters: int = 200, seed: int = 0):
+    """Clustered unit vectors, roughly mimicking groups of images of the same equipment"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + rng.normal(scale=0.6, size=(count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [f"synthetic-{i}" for i in range(count)], vectors
+
+
+def database_corpus():
+    from server import load_vector_index, vector_index
+
+    asyncio.run(load_vector_index())
+    return vector_index.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of the DB")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = automatic (~4*sqrt(N))")
+    parser.add_argument("--nprobes", default="1,2,4,8,16,32,64")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    ids, vectors = synthetic_corpus(args.synthetic) if args.synthetic else database_corpus()
+    if len(ids) == 0:
+        raise SystemExit("No vectors to build a report from")
+
+    report = recall_report(
+        vectors, ids,
+        nlist=args.nlist,
+        nprobes=[int(n) for n in args.nprobes.split(",")],
+        top_k=args.top_k,
+        num_queries=args.queries
+    )
+
+    print(f"corpus={report['corpus_size']} nlist={report['nlist']} top_k={report['top_k']} "
+          f"build={report['build_seconds']:.2f}s exact={report['exact_latency_ms']:.2f}ms/query")
+    print(f"{'nprobe':>6} {'recall@' + str(args.top_k):>10} {'ms/query':>9} {'speedup':>8}")
+    for row in report["results"]:
+        print(f"{row['nprobe']:>6} {row[f'recall@{args.top_k}']:>10.3f} {row['latency_ms']:>9.2f} {row['speedup']:>8.1f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Backfills the pgvector column "vectorData" from "vectorDataBinary" / legacy "vectorDataJson".
+
+Rows are converted in batches (each batch is its own transaction), so the
+command can be interrupted and re-run: it only picks rows where "vectorData"
+is still NULL. Only embeddings of the default model (CLIP_MODEL) are converted,
+the column has a fixed dimension.
+
+Usage:
+    python backfill_pgvector.py
+    python backfill_pgvector.py --batch-size 2000 --index ivfflat
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import asyncpg
+
+from server import EMBEDDING_DIM, clip_model, get_db_connect_params, to_pgvector_literal
+from vector_codec import decode_stored
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "ImageEmbedding_vectorData_idx"
+
+
+async def backfill(batch_size: int) -> int:
+    conn = await asyncpg.connect(**get_db_connect_params())
+    converted = 0
+    skipped = set()
+    start_time = time.time()
+    try:
+        while True:
+            rows = await conn.fetch(
+                '''
+                SELECT id, "vectorDataJson", "vectorDataBinary" FROM "ImageEmbedding"
+                WHERE "vectorData" IS NULL
+                  AND ("vectorDataJson" IS NOT NULL OR "vectorDataBinary" IS NOT NULL)
+                  AND NOT (id = ANY($2::text[]))
+                  AND "modelId" = $3
+                ORDER BY id
+                LIMIT $1
+                ''',
+                batch_size,
+                list(skipped),
+                clip_model.name
+            )
+            if not rows:
+                break
+
+            ids, literals = [], []
+            for row in rows:
+                vector = decode_stored(row['vectorDataBinary'], row['vectorDataJson'])
+                if len(vector) != EMBEDDING_DIM:
+                    logger.warning(f"Skipping {row['id']}: expected {EMBEDDING_DIM} dimensions, got {len(vector)}")
+                    skipped.add(row['id'])
+                    continue
+                ids.append(row['id'])
+                literals.append(to_pgvector_literal(vector))
+
+            if ids:
+                async with conn.transaction():
+                    await conn.execute(
+                        '''
+                        UPDATE "ImageEmbedding" AS ie
+                        SET "vectorData" = v.vector::vector
+                        FROM unnest($1::text[], $2::text[]) AS v(id, vector)
+                        WHERE ie.id = v.id
+                        ''',
+                        ids,
+                        literals
+                    )
+                converted += len(ids)
+                logger.info(f"Converted {converted} rows ({converted / (time.time() - start_time):.0f} rows/s)")
+    finally:
+        await conn.close()
+
+    if skipped:
+        logger.warning(f"{len(skipped)} rows were skipped because of a dimension mismatch")
+    return converted
+
+
+async def rebuild_index(method: str, lists: int):
+    """Recreates the ANN index; IVFFlat must be built after the data is loaded"""
+    conn = await asyncpg.connect(**get_db_connect_params())
+    try:
+        await conn.execute(f'DROP INDEX IF EXISTS "{INDEX_NAME}"')
+        if method == "hnsw":
+            await conn.execute(
+                f'CREATE INDEX "{INDEX_NAME}" ON "ImageEmbedding" USING hnsw ("vectorData" vector_cosine_ops)'
+            )
+        else:
+            if not lists:
+                count = await conn.fetchval('SELECT count(*) FROM "ImageEmbedding" WHERE "vectorData" IS NOT NULL')
+                lists = max(1, count // 1000) if count <= 1_000_000 else int(count ** 0.5)
+            await conn.execute(
+                f'CREATE INDEX "{INDEX_NAME}" ON "ImageEmbedding" '
+                f'USING ivfflat ("vectorData" vector_cosine_ops) WITH (lists = {int(lists)})'
+            )
+        await conn.execute('ANALYZE "ImageEmbedding"')
+    finally:
+        await conn.close()
+    logger.info(f"Rebuilt {method} index {INDEX_NAME}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--index", choices=["hnsw", "ivfflat"], help="recreate the vector index after backfill")
+    parser.add_argument("--lists", type=int, default=0, help="IVFFlat lists (0 = rows/1000, or sqrt(rows) above 1M)")
+    args = parser.parse_args()
+
+    converted = asyncio.run(backfill(args.batch_size))
+    logger.info(f"Backfill finished: {converted} rows converted")
+    if args.index:
+        asyncio.run(rebuild_index(args.index, args.lists))
+
+
+if __name__ == "__main__":
+    main()
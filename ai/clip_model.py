@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# fp32: the model as clip.load returns it
+# int8: dynamic int8 quantization of the nn.Linear layers (MLP blocks, projections), CPU only
+# torchscript: image encoder traced, frozen and optimized for inference, CPU only
+# int8-torchscript: both
+BACKENDS = ("fp32", "int8", "torchscript", "int8-torchscript")
+
+# Embedding size of the published CLIP models (checkpoint paths are read from the loaded model)
+EMBEDDING_DIMS = {
+    "RN50": 1024, "RN101": 512, "RN50x4": 640, "RN50x16": 768, "RN50x64": 1024,
+    "ViT-B/32": 512, "ViT-B/16": 512, "ViT-L/14": 768, "ViT-L/14@336px": 768
+}
+
+
+class ClipModel:
+    """
+    CLIP weights loaded once, on first use or ahead of time with `load()`.
+
+    torch and clip are imported only when the model is loaded, so importing the
+    server (scripts, health checks) does not pay for them. `name` is a CLIP
+    model name or a path to a checkpoint; a name whose weights are already in
+    `download_root` is loaded straight from the file, which skips clip's
+    SHA-256 re-check of the whole checkpoint on every start and never touches
+    the network.
+
+    `backend` selects how the CPU forward pass runs (see BACKENDS); on CUDA the
+    model always stays fp32. `num_threads` > 0 is passed to
+    `torch.set_num_threads` when the model is loaded. Use `encode_image` and
+    `encode_text` rather than calling `model` directly so the selected
+    backend is used.
+    """
+
+    def __init__(self, name: str = "ViT-B/32", device: Optional[str] = None, download_root: Optional[str] = None,
+                 backend: str = "fp32", num_threads: int = 0):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown CLIP backend {backend!r}, expected one of {BACKENDS}")
+        self.name = name
+        self.requested_device = device
+        self.download_root = download_root or os.path.expanduser("~/.cache/clip")
+        self.requested_backend = backend
+        self.num_threads = num_threads
+        self.backend: Optional[str] = None
+        self.device: Optional[str] = None
+        self.model = None
+        self.preprocess = None
+        self.image_encoder = None
+        self.source: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    @property
+    def embedding_dim(self) -> int:
+        """Size of the embeddings; loads the model if `name` is not a known CLIP model"""
+        if self.name in EMBEDDING_DIMS:
+            return EMBEDDING_DIMS[self.name]
+        return self.get().visual.output_dim
+
+    def _checkpoint(self) -> Tuple[str, str]:
+        """Returns (what to pass to clip.load, where the weights come from)"""
+        import clip
+
+        if os.path.isfile(self.name):
+            return self.name, "path"
+        url = clip.clip._MODELS.get(self.name)
+        if url is not None:
+            cached = os.path.join(self.download_root, os.path.basename(url))
+            if os.path.isfile(cached):
+                return cached, "cache"
+        return self.name, "download"
+
+    def load(self):
+        """Loads the weights if they are not loaded yet; safe to call from several threads"""
+        if self.model is not None:
+            return
+        with self._lock:
+            if self.model is not None:
+                return
+            started = time.perf_counter()
+            import torch
+            import clip
+
+            if self.num_threads > 0:
+                torch.set_num_threads(self.num_threads)
+            device = self.requested_device or ("cuda" if torch.cuda.is_available() else "cpu")
+            checkpoint, source = self._checkpoint()
+            logger.info(f"Loading CLIP {self.name} on {device} ({source}: {checkpoint})")
+            model, preprocess = clip.load(checkpoint, device=device, download_root=self.download_root)
+            model.eval()  # Встановлення моделі в режим оцінки
+            backend = self.requested_backend
+            if device != "cpu" and backend != "fp32":
+                logger.warning(f"CLIP backend {backend} is CPU only, using fp32 on {device}")
+                backend = "fp32"
+            if backend.startswith("int8"):
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+            image_encoder = model.encode_image
+            if backend.endswith("torchscript"):
+                image_encoder = self._trace_image_encoder(model)
+            self.device, self.preprocess, self.source, self.backend = device, preprocess, source, backend
+            self.image_encoder = image_encoder
+            self.load_seconds = time.perf_counter() - started
+            self.model = model
+            logger.info(f"CLIP {self.name} ({backend}, {torch.get_num_threads()} threads) loaded in {self.load_seconds:.2f}s")
+
+    @staticmethod
+    def _trace_image_encoder(model):
+        """Traces model.visual on a dummy batch, then freezes and optimizes the graph for inference"""
+        import torch
+
+        resolution = model.visual.input_resolution
+        example = torch.zeros((2, 3, resolution, resolution), dtype=torch.float32)
+        with torch.no_grad():
+            traced = torch.jit.trace(model.visual, example, check_trace=False)
+            return torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+
+    def get(self):
+        """The loaded model (loads it on first call)"""
+        self.load()
+        return self.model
+
+    def encode_image(self, image_input):
+        """Image features for a preprocessed batch, through the selected backend"""
+        self.load()
+        return self.image_encoder(image_input.to(self.device, non_blocking=True))
+
+    def encode_text(self, tokens):
+        self.load()
+        return self.model.encode_text(tokens.to(self.device))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "embedding_dim": EMBEDDING_DIMS.get(self.name) if not self.loaded else self.model.visual.output_dim,
+            "loaded": self.loaded,
+            "backend": self.backend or self.requested_backend,
+            "num_threads": self.num_threads,
+            "device": self.device,
+            "source": self.source,
+            "load_seconds": self.load_seconds
+        }
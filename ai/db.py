@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+
+class DatabasePool:
+    """
+    Application-lifetime asyncpg pool shared by all routes.
+
+    Flask runs every async view in its own short-lived event loop, while asyncpg
+    connections are bound to the loop that created them. The pool therefore
+    lives on a dedicated background loop thread; callers hand it a coroutine
+    function `fn(conn, *args)` which runs there on a pooled connection, and
+    await the result from their own loop.
+    """
+
+    def __init__(self, connect_params: Dict[str, Any], min_size: int = 2, max_size: int = 10,
+                 acquire_timeout: float = 30.0, command_timeout: Optional[float] = None,
+                 statement_cache_size: int = 100, max_inactive_lifetime: float = 300.0):
+        self.connect_params = connect_params
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.command_timeout = command_timeout
+        self.statement_cache_size = statement_cache_size
+        self.max_inactive_lifetime = max_inactive_lifetime
+        self._pool: Optional[asyncpg.Pool] = None
+        self._pool_lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._acquires = 0
+        self._acquire_errors = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._thread_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="db-pool-loop", daemon=True)
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            if self._pool_lock is None:
+                self._pool_lock = asyncio.Lock()
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        **self.connect_params,
+                        min_size=self.min_size,
+                        max_size=self.max_size,
+                        command_timeout=self.command_timeout,
+                        statement_cache_size=self.statement_cache_size,
+                        max_inactive_connection_lifetime=self.max_inactive_lifetime
+                    )
+                    logger.info(f"Database pool created (min={self.min_size}, max={self.max_size})")
+        return self._pool
+
+    async def _run_on_pool(self, fn: Callable[..., Awaitable[Any]], args: tuple) -> Any:
+        pool = await self._get_pool()
+        started = time.perf_counter()
+        try:
+            conn = await pool.acquire(timeout=self.acquire_timeout)
+        except Exception:
+            with self._stats_lock:
+                self._acquire_errors += 1
+            raise
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self._acquires += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        try:
+            return await fn(conn, *args)
+        finally:
+            await pool.release(conn)
+
+    async def run(self, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Runs `fn(conn, *args)` on a pooled connection and returns its result"""
+        future = asyncio.run_coroutine_threadsafe(self._run_on_pool(fn, args), self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    async def fetch(self, query: str, *args):
+        return await self.run(lambda conn: conn.fetch(query, *args))
+
+    async def fetchrow(self, query: str, *args):
+        return await self.run(lambda conn: conn.fetchrow(query, *args))
+
+    async def fetchval(self, query: str, *args):
+        return await self.run(lambda conn: conn.fetchval(query, *args))
+
+    async def execute(self, query: str, *args):
+        return await self.run(lambda conn: conn.execute(query, *args))
+
+    def close(self):
+        """Closes all connections and stops the pool loop"""
+        with self._thread_lock:
+            if self._loop is None:
+                return
+            if self._pool is not None:
+                asyncio.run_coroutine_threadsafe(self._pool.close(), self._loop).result(timeout=10)
+                self._pool = None
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self._pool
+        with self._stats_lock:
+            return {
+                "status": "up" if pool is not None else "not_started",
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": pool.get_size() if pool is not None else 0,
+                "idle": pool.get_idle_size() if pool is not None else 0,
+                "acquires": self._acquires,
+                "acquire_errors": self._acquire_errors,
+                "mean_acquire_wait_ms": self._wait_total * 1000 / self._acquires if self._acquires else 0.0,
+                "max_acquire_wait_ms": self._wait_max * 1000,
+                "statement_cache_size": self.statement_cache_size
+            }
@@ -0,0 +1,167 @@
+"""
+Checks that the serving image path stays numerically close to the reference.
+
+The reference is the original per-image path: full-resolution decode, CLIP's
+`preprocess` transform and a float32 forward pass. The checked path is
+`server.encode_image_batch` with the current settings (PREPROCESS_DRAFT_SCALE,
+CLIP_BACKEND, ...). Text queries are compared the same way between the fp32
+model and `server.encode_text_batch`. The script reports cosine similarity
+between both embeddings and exits with status 1 if any image or text falls
+below --tolerance.
+
+Usage:
+    python drift_check.py --images ./fixtures
+    python drift_check.py --synthetic 32 --tolerance 0.995 --output drift.json
+    python drift_check.py --images ./fixtures --backend int8
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+DEFAULT_TOLERANCE = 0.995
+DEFAULT_TEXTS = [
+    "a main battle tank", "an armored personnel carrier", "a self-propelled howitzer",
+    "a multiple rocket launcher", "an attack helicopter", "a fighter jet", "a military truck",
+    "an air defense system"
+]
+
+
+def load_fixtures(directory: str):
+    paths = sorted(path for pattern in ("*.jpg", "*.jpeg", "*.png", "*.webp")
+                   for path in glob.glob(os.path.join(directory, pattern)))
+    fixtures = []
+    for path in paths:
+        with open(path, "rb") as f:
+            fixtures.append((os.path.basename(path), f.read()))
+    return fixtures
+
+
+def reference_model(server):
+    """The serving model if it runs fp32, otherwise a separate fp32 copy of the same weights"""
+    from clip_model import ClipModel
+
+    served = server.clip_model
+    served.load()
+    if served.backend == "fp32":
+        return served
+    reference = ClipModel(served.name, device=served.device, download_root=served.download_root, backend="fp32")
+    reference.load()
+    return reference
+
+
+def reference_embeddings(reference, images) -> np.ndarray:
+    """Full decode + CLIP preprocess + float32 forward pass, one image at a time"""
+    import torch
+    from PIL import Image
+
+    vectors = []
+    with torch.no_grad():
+        for image_bytes in images:
+            image_input = reference.preprocess(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+            features = reference.model.encode_image(image_input.unsqueeze(0).to(reference.device)).float()
+            features /= features.norm(dim=-1, keepdim=True)
+            vectors.append(features.cpu().numpy()[0])
+    return np.stack(vectors)
+
+
+def reference_text_embeddings(reference, texts) -> np.ndarray:
+    import torch
+    import clip
+
+    with torch.no_grad():
+        features = reference.model.encode_text(clip.tokenize(texts).to(reference.device)).float()
+        features /= features.norm(dim=-1, keepdim=True)
+    return features.cpu().numpy()
+
+
+def similarity_summary(similarities: np.ndarray) -> dict:
+    return {
+        "min": float(similarities.min()),
+        "mean": float(similarities.mean()),
+        "max": float(similarities.max())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="directory with fixture images")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate N synthetic JPEG fixtures instead")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="minimum cosine similarity")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--backend", help="CLIP_BACKEND to check (default: the server's setting)")
+    parser.add_argument("--texts", nargs="*", default=DEFAULT_TEXTS, help="text queries to compare")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.images:
+        fixtures = load_fixtures(args.images)
+    elif args.synthetic:
+        from benchmark import make_fixtures
+
+        directory = tempfile.mkdtemp(prefix="ai-drift-")
+        make_fixtures(directory, args.synthetic)
+        fixtures = load_fixtures(directory)
+    else:
+        parser.error("either --images or --synthetic is required")
+    if not fixtures:
+        parser.error("no fixture images found")
+
+    if args.backend:
+        os.environ["CLIP_BACKEND"] = args.backend
+    import server
+
+    names = [name for name, _ in fixtures]
+    images = [image_bytes for _, image_bytes in fixtures]
+    model = reference_model(server)
+    reference = reference_embeddings(model, images)
+    candidate = [vector for start in range(0, len(images), args.batch_size)
+                 for vector in server.encode_image_batch(images[start:start + args.batch_size])]
+    undecoded = [name for name, vector in zip(names, candidate) if isinstance(vector, Exception)]
+    if undecoded:
+        raise SystemExit(f"Fixtures that cannot be decoded: {', '.join(undecoded)}")
+    candidate = np.stack(candidate).astype(np.float32)
+    candidate /= np.linalg.norm(candidate, axis=1, keepdims=True)
+    similarities = np.sum(reference * candidate, axis=1)
+    failed = [name for name, similarity in zip(names, similarities) if similarity < args.tolerance]
+
+    report = {
+        "images": len(images),
+        "tolerance": args.tolerance,
+        "settings": {
+            "preprocess_draft_scale": server.PREPROCESS_DRAFT_SCALE,
+            "backend": server.clip_model.backend,
+            "device": server.clip_model.device
+        },
+        "cosine_similarity": similarity_summary(similarities),
+        "max_abs_diff": float(np.abs(reference - candidate).max())
+    }
+    if args.texts:
+        text_reference = reference_text_embeddings(model, args.texts)
+        text_candidate = np.stack(server.encode_text_batch(args.texts)).astype(np.float32)
+        text_candidate /= np.linalg.norm(text_candidate, axis=1, keepdims=True)
+        text_similarities = np.sum(text_reference * text_candidate, axis=1)
+        failed += [f"text:{text}" for text, similarity in zip(args.texts, text_similarities)
+                   if similarity < args.tolerance]
+        report["texts"] = len(args.texts)
+        report["text_cosine_similarity"] = similarity_summary(text_similarities)
+    report.update({
+        "failed": failed,
+        "status": "ok" if not failed else "drift"
+    })
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
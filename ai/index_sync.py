@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+_CHANGE_COLUMNS = '''
+    SELECT id, "tableName" AS table_name, operation, "rowId" AS row_id,
+           extract(epoch FROM statement_timestamp() - "createdAt") AS age_seconds
+    FROM "IndexChange"
+'''
+
+
+class IndexSync:
+    """
+    Follows the "IndexChange" log (filled by triggers on every write, whoever the
+    writer is) and hands new changes to `apply_changes(conn, changes)`.
+
+    Runs on its own event loop thread with one dedicated connection. It LISTENs
+    on `channel`, so a committed change is picked up right away, and also polls
+    every `interval` seconds in case a notification was missed (reconnects,
+    several writers). Progress is a change-id watermark: every id at or below it
+    has been applied. Ids from concurrent transactions can commit out of order,
+    so an id above the watermark that is still missing is waited for up to
+    `gap_timeout` seconds before the watermark moves past it. A skipped id is
+    still looked up on every poll for `recheck_seconds`, so a transaction that
+    commits after the timeout is applied late rather than lost. Changes are
+    applied at least once, so `apply_changes` must be idempotent.
+    """
+
+    def __init__(self, connect_params: Dict[str, Any],
+                 apply_changes: Callable[[asyncpg.Connection, List[asyncpg.Record]], Awaitable[Any]],
+                 channel: str = "ai_index_changes", interval: float = 5.0, batch_size: int = 1000,
+                 retention_seconds: float = 86400.0, gap_timeout: float = 30.0, recheck_seconds: float = 3600.0,
+                 name: str = "index-sync"):
+        self.connect_params = connect_params
+        self.apply_changes = apply_changes
+        self.channel = channel
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retention_seconds = retention_seconds
+        self.gap_timeout = gap_timeout
+        self.recheck_seconds = recheck_seconds
+        self.name = name
+        self.watermark = 0
+        self.started = False  # watermark is a real log position (stays True after stop)
+        self._applied_above: Set[int] = set()
+        self._gaps: Dict[int, float] = {}
+        self._skipped: Dict[int, float] = {}  # ids the watermark moved past -> when
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._task = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._lock = threading.Lock()
+        self.connected = False
+        self.polls = 0
+        self.applied = 0
+        self.late_changes = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_poll_at: Optional[float] = None
+        self.last_applied_at: Optional[float] = None
+        self.lag_seconds = 0.0
+        self.pending = False
+        self._last_prune = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def start(self, watermark: int):
+        """Starts following the log from `watermark` (the last change already reflected in the index)"""
+        with self._lock:
+            if self._loop is not None:
+                return
+            self.watermark = watermark
+            self.started = True
+            self._stopping = False
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name=f"{self.name}-loop", daemon=True)
+            self._thread.start()
+            self._loop = loop
+        self._task = asyncio.run_coroutine_threadsafe(self._run(), loop)
+        logger.info(f"Index sync started from change {watermark}")
+
+    def stop(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        self._stopping = True
+        if self._wakeup is not None:
+            loop.call_soon_threadsafe(self._wakeup.set)
+        try:
+            self._task.result(timeout=5)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
+
+    def _notified(self, *args):
+        self._wakeup.set()
+
+    async def _run(self):
+        self._wakeup = asyncio.Event()
+        backoff = 1.0
+        while not self._stopping:
+            conn = None
+            try:
+                conn = await asyncpg.connect(**self.connect_params)
+                await conn.add_listener(self.channel, self._notified)
+                self.connected = True
+                backoff = 1.0
+                while not self._stopping:
+                    await self.poll(conn)
+                    if self.pending:
+                        continue
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+                    except asyncio.TimeoutError:
+                        pass
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                logger.error(f"Index sync failed, retrying in {backoff:.0f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+            finally:
+                self.connected = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+    async def poll(self, conn: asyncpg.Connection) -> int:
+        """Applies the next batch of changes; returns how many were applied"""
+        late = await self._late_changes(conn)
+        changes = await conn.fetch(_CHANGE_COLUMNS + '''
+            WHERE id > $1 AND id <> ALL($2::bigint[])
+            ORDER BY id
+            LIMIT $3
+        ''', self.watermark, list(self._applied_above), self.batch_size)
+        now = time.time()
+        self.polls += 1
+        self.last_poll_at = now
+        self.pending = len(changes) == self.batch_size
+        if late:
+            await self.apply_changes(conn, late)
+            self.applied += len(late)
+        if changes:
+            await self.apply_changes(conn, changes)
+            self.applied += len(changes)
+            self.last_applied_at = now
+            # Lag: how long the oldest change of the batch waited to be applied
+            self.lag_seconds = float(max(change['age_seconds'] for change in changes))
+        elif not self._gaps:
+            self.lag_seconds = 0.0
+        self._advance([change['id'] for change in changes])
+        if now - self._last_prune > 600:
+            await self._prune(conn)
+            self._last_prune = now
+        return len(late) + len(changes)
+
+    async def _late_changes(self, conn: asyncpg.Connection) -> List[asyncpg.Record]:
+        """Skipped ids that have appeared since (their transaction committed after `gap_timeout`)"""
+        now = time.monotonic()
+        for change_id, skipped_at in list(self._skipped.items()):
+            if now - skipped_at > self.recheck_seconds:
+                del self._skipped[change_id]
+        if not self._skipped:
+            return []
+        late = await conn.fetch(_CHANGE_COLUMNS + ' WHERE id = ANY($1::bigint[]) ORDER BY id', list(self._skipped))
+        for change in late:
+            del self._skipped[change['id']]
+        if late:
+            self.late_changes += len(late)
+            logger.warning(f"Applying {len(late)} index changes that committed after the {self.gap_timeout:.0f}s "
+                           f"gap timeout: {[change['id'] for change in late]}")
+        return late
+
+    async def catch_up(self, conn: asyncpg.Connection, watermark: int) -> int:
+        """
+        Applies every change after `watermark` (e.g. the one an index snapshot was
+        saved at) on `conn` before `start`; returns how many changes were applied
+        """
+        self.watermark = watermark
+        self._applied_above.clear()
+        self._gaps.clear()
+        applied = await self.poll(conn)
+        while self.pending:
+            applied += await self.poll(conn)
+        return applied
+
+    def _advance(self, ids: List[int]):
+        now = time.monotonic()
+        self._applied_above.update(change_id for change_id in ids if change_id > self.watermark)
+        for missing in range(self.watermark + 1, max(ids, default=0)):
+            if missing not in self._applied_above:
+                self._gaps.setdefault(missing, now)
+        while True:
+            following = self.watermark + 1
+            if following in self._applied_above:
+                self._applied_above.discard(following)
+            elif following in self._gaps and now - self._gaps[following] > self.gap_timeout:
+                logger.debug(f"Index change {following} did not appear in {self.gap_timeout:.0f}s, "
+                             f"re-checking it for {self.recheck_seconds:.0f}s")
+                self._skipped[following] = now
+            else:
+                break
+            self._gaps.pop(following, None)
+            self.watermark = following
+
+    async def _prune(self, conn: asyncpg.Connection):
+        """Deletes log entries older than the retention period (shared by all server instances)"""
+        await conn.execute('DELETE FROM "IndexChange" WHERE "createdAt" < statement_timestamp() - make_interval(secs => $1)',
+                           float(self.retention_seconds))
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "running": self.running,
+            "connected": self.connected,
+            "watermark": self.watermark,
+            "waiting_for_gaps": len(self._gaps),
+            "skipped_changes": len(self._skipped),
+            "late_changes": self.late_changes,
+            "polls": self.polls,
+            "applied_changes": self.applied,
+            "pending": self.pending,
+            "lag_seconds": self.lag_seconds,
+            "seconds_since_last_poll": now - self.last_poll_at if self.last_poll_at else None,
+            "seconds_since_last_change": now - self.last_applied_at if self.last_applied_at else None,
+            "errors": self.errors,
+            "last_error": self.last_error
+        }
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects jobs submitted from any thread/event loop and runs them in batches.
+
+    A dedicated worker thread waits for the first job, then keeps collecting
+    until `max_batch_size` jobs are queued or `max_wait_ms` has passed since
+    that first job, and calls `batch_fn(items) -> results` once for the whole
+    batch. Each caller gets its own result (or the batch exception) through a
+    concurrent.futures.Future, so it works across the per-request event loops
+    Flask creates for async views. `batch_fn` may return an exception instance
+    in place of a result to fail only that job (e.g. an image that does not
+    decode), the rest of the batch still gets its results.
+
+    With `workers` > 1 several batches can be in flight at once (e.g. when
+    `batch_fn` hands the batch to one of several inference processes).
+    """
+
+    def __init__(self, batch_fn: Callable[[Sequence[Any]], Sequence[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 10.0, name: str = "batcher", workers: int = 1):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_batch = 0
+        self._batch_sizes: Dict[int, int] = {}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self.workers = max(1, workers)
+        self._threads = [threading.Thread(target=self._worker, name=f"{name}-worker-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        """Submits a job and blocks until its result is ready"""
+        return self.submit(item).result()
+
+    async def run(self, item: Any) -> Any:
+        """Submits a job and awaits its result on the caller's event loop"""
+        return await asyncio.wrap_future(self.submit(item))
+
+    async def run_many(self, items: Sequence[Any], return_exceptions: bool = False) -> List[Any]:
+        """
+        Submits several jobs back to back (so they land in the same batch, up to
+        `max_batch_size` per batch) and awaits all results in order. With
+        `return_exceptions` a failed job's exception is returned in its place
+        instead of being raised.
+        """
+        futures = [self.submit(item) for item in items]
+        return list(await asyncio.gather(*(asyncio.wrap_future(future) for future in futures),
+                                         return_exceptions=return_exceptions))
+
+    def _collect(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            batch = [job for job in batch if job[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.batch_fn([item for item, _, _ in batch])
+                for (_, future, _), result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+            except Exception as e:
+                logger.error(f"{self.name}: batch of {len(batch)} failed: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            self._record(batch, started, time.perf_counter())
+
+    def _record(self, batch: List[tuple], started: float, finished: float):
+        waits = [started - enqueued for _, _, enqueued in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._max_batch = max(self._max_batch, len(batch))
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+            self._run_total += finished - started
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "workers": self.workers,
+                "window_ms": self.max_wait * 1000,
+                "queued": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "largest_batch": self._max_batch,
+                "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+                "mean_queue_wait_ms": self._wait_total * 1000 / self._items if self._items else 0.0,
+                "max_queue_wait_ms": self._wait_max * 1000,
+                "mean_batch_run_ms": self._run_total * 1000 / self._batches if self._batches else 0.0
+            }
+
+
+def start_worker_processes(workers: int, initializer: Optional[Callable] = None,
+                           initargs: tuple = ()) -> ProcessPoolExecutor:
+    """
+    Forks `workers` processes right away and waits until they are up.
+
+    Called after the model is loaded, so every worker inherits the weights
+    (put into shared memory beforehand) instead of loading its own copy.
+    Requires the "fork" start method (Linux); jobs must be module-level functions.
+    """
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"),
+                                   initializer=initializer, initargs=initargs)
+    pids = {future.result() for future in [executor.submit(os.getpid) for _ in range(workers)]}
+    logger.info(f"Started {workers} inference worker processes: {sorted(pids)}")
+    return executor
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Runs background jobs on a dedicated event loop thread, `concurrency` at a time.
+
+    The queue only schedules work: `run_job(job_id)` is a coroutine function that
+    claims the job, does the work and persists its own state, so a job submitted
+    twice or after a restart simply finds nothing left to do.
+    """
+
+    def __init__(self, run_job: Callable[[str], Awaitable[Any]], concurrency: int = 1, name: str = "jobs"):
+        self.run_job = run_job
+        self.concurrency = max(1, concurrency)
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._queued: Set[str] = set()
+        self._running: Set[str] = set()
+        self.completed = 0
+        self.failed = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name=f"{self.name}-loop", daemon=True)
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    async def _run(self, job_id: str):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            with self._lock:
+                self._queued.discard(job_id)
+                self._running.add(job_id)
+            try:
+                await self.run_job(job_id)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Job {job_id} failed: {e}")
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+
+    def submit(self, job_id: str) -> bool:
+        """Schedules a job; returns False if it is already queued or running here"""
+        loop = self._ensure_loop()
+        with self._lock:
+            if job_id in self._queued or job_id in self._running:
+                return False
+            self._queued.add(job_id)
+        asyncio.run_coroutine_threadsafe(self._run(job_id), loop)
+        return True
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "queued": len(self._queued),
+                "running": len(self._running),
+                "completed": self.completed,
+                "failed": self.failed
+            }
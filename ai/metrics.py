@@ -0,0 +1,170 @@
+"""
+Per-stage latency histograms and error counters in Prometheus text format.
+
+Routes set the current route once (see `Metrics.instrument`); code further down
+the call chain only names its stage:
+
+    with metrics.stage("download"):
+        image_bytes = download_from_url(url)
+
+The route is kept in a context variable, so it follows the request through
+sync helpers and asyncio tasks (executor calls need contextvars.copy_context()).
+"""
+import bisect
+import contextvars
+import functools
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_route = contextvars.ContextVar("metrics_route", default="other")
+
+# (metric name, help text, type, [(labels, value)])
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def process_rss_bytes() -> int:
+    """Current resident set size of this process (peak RSS where /proc is not available)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+
+
+class Histogram:
+    """Cumulative-bucket histogram, safe to update from several threads"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metrics:
+    """Registry of stage duration histograms and stage error counters"""
+
+    def __init__(self, namespace: str = "ai", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    @staticmethod
+    def current_route() -> str:
+        return _route.get()
+
+    def observe(self, stage: str, seconds: float, route: Optional[str] = None):
+        key = (route or _route.get(), stage)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def count_error(self, stage: str, route: Optional[str] = None):
+        key = (route or _route.get(), stage)
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    @contextmanager
+    def stage(self, stage: str, route: Optional[str] = None):
+        """Times a block; an exception is counted as an error of that stage and re-raised"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.count_error(stage, route)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - started, route)
+
+    def instrument(self, route: str):
+        """Decorator for async views: sets the route and records the "total" stage"""
+        def decorator(view):
+            @functools.wraps(view)
+            async def wrapper(*args, **kwargs):
+                token = _route.set(route)
+                started = time.perf_counter()
+                try:
+                    response = await view(*args, **kwargs)
+                    if isinstance(response, tuple) and len(response) > 1 and int(response[1]) >= 500:
+                        self.count_error("total", route)
+                    return response
+                except Exception:
+                    self.count_error("total", route)
+                    raise
+                finally:
+                    self.observe("total", time.perf_counter() - started, route)
+                    _route.reset(token)
+            return wrapper
+        return decorator
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """Registers a callback that returns extra samples (gauges/counters) at render time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        name = f"{self.namespace}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent per request stage.", f"# TYPE {name} histogram"]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            errors = sorted(self._errors.items())
+        for (route, stage), histogram in histograms:
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels({'route': route, 'stage': stage, 'le': le})} {cumulative}")
+            labels = _format_labels({"route": route, "stage": stage})
+            lines.append(f"{name}_sum{labels} {repr(total)}")
+            lines.append(f"{name}_count{labels} {count}")
+
+        name = f"{self.namespace}_stage_errors_total"
+        lines += [f"# HELP {name} Errors raised per request stage.", f"# TYPE {name} counter"]
+        for (route, stage), count in errors:
+            lines.append(f"{name}{_format_labels({'route': route, 'stage': stage})} {count}")
+
+        for collector in self._collectors:
+            for metric, help_text, metric_type, samples in collector():
+                metric = f"{self.namespace}_{metric}"
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {metric_type}"]
+                lines += [f"{metric}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
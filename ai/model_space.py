@@ -0,0 +1,68 @@
+import os
+import re
+from typing import Any, Dict, Optional
+
+from cache import TTLCache
+from clip_model import ClipModel
+from inference import MicroBatcher
+from vector_index import VectorIndex
+
+
+class ModelSpace:
+    """
+    One embedding model and everything tied to its vector space.
+
+    Embeddings of different models are not comparable (ViT-L/14 is not even
+    the same size as ViT-B/32), so every model gets its own vector index,
+    inference batchers and query embedding caches. Stored embeddings carry
+    their "modelId" and "dimension" and are only loaded into the index of the
+    same model.
+    """
+
+    def __init__(self, model: ClipModel, index: VectorIndex, image_batcher: MicroBatcher,
+                 text_batcher: MicroBatcher, text_cache: TTLCache, image_cache: TTLCache, default: bool = False):
+        self.model = model
+        self.index = index
+        self.image_batcher = image_batcher
+        self.text_batcher = text_batcher
+        self.text_cache = text_cache
+        self.image_cache = image_cache
+        self.default = default
+        self.snapshot_change_id: Optional[int] = None  # change-log position of the last saved snapshot
+
+    @property
+    def name(self) -> str:
+        return self.model.name
+
+    @property
+    def dim(self) -> int:
+        return self.index.dim
+
+    @property
+    def slug(self) -> str:
+        """File name friendly model id, e.g. "vit-l-14" for ViT-L/14"""
+        return model_slug(self.name)
+
+    def path(self, base: str) -> str:
+        """Per-model variant of a data path (`<base>-<slug><ext>`); the default model keeps `base`"""
+        if not base or self.default:
+            return base
+        root, ext = os.path.splitext(base)
+        return f"{root}-{self.slug}{ext}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default": self.default,
+            "embedding_dim": self.dim,
+            "model": self.model.stats(),
+            "index_loaded": self.index.loaded,
+            "index_size": len(self.index),
+            "query_cache": {
+                "text": self.text_cache.stats(),
+                "image": self.image_cache.stats()
+            }
+        }
+
+
+def model_slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
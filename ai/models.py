@@ -0,0 +1,77 @@
+"""
+SQLAlchemy models mirroring the Prisma schema (course-work/prisma/schema.prisma).
+
+The service itself talks to Postgres through asyncpg (see db.py); these models
+are only used to create the tables for a standalone database, e.g. for
+benchmark.py. Kept out of server.py so SQLAlchemy is imported only when needed.
+"""
+from uuid import uuid4
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, JSON, LargeBinary, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.sql import func
+
+Base = declarative_base()
+
+# Визначення моделей SQLAlchemy
+class MilitaryEquipment(Base):
+    __tablename__ = "MilitaryEquipment"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid4()))
+    name = Column(String, nullable=False)
+    type = Column(String, nullable=False)
+    country = Column(String, nullable=False)
+    inService = Column(Boolean, default=True)
+    description = Column(Text, nullable=True)
+    year = Column(Integer, nullable=True)
+    imageUrl = Column(String, nullable=True)
+    technicalSpecs = Column(Text, nullable=True)
+    createdAt = Column(DateTime, default=func.now())
+    updatedAt = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    # Зв'язок one-to-many з ImageEmbedding
+    imageEmbeddings = relationship("ImageEmbedding", back_populates="militaryEquipment", cascade="all, delete")
+
+class ImageEmbedding(Base):
+    __tablename__ = "ImageEmbedding"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid4()))
+    imageSource = Column(String, nullable=False)
+    vectorDataJson = Column(Text, nullable=True)  # JSON string для зберігання вектора
+    vectorDataBinary = Column(LargeBinary, nullable=True)  # Бінарний вектор (див. vector_codec.py)
+    contentHash = Column(String, nullable=True, index=True)  # SHA-256 байтів зображення
+    modelId = Column(String, nullable=False, default="ViT-B/32", server_default="ViT-B/32", index=True)  # модель CLIP вектора
+    dimension = Column(Integer, nullable=False, default=512, server_default="512")
+    metadataJson = Column(JSON, nullable=True)  # Renamed from metadata to avoid conflict with SQLAlchemy reserved word
+    createdAt = Column(DateTime, default=func.now())
+    updatedAt = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    # Зовнішній ключ і зв'язок many-to-one
+    militaryEquipmentId = Column(String, ForeignKey("MilitaryEquipment.id", ondelete="CASCADE"), nullable=False)
+    militaryEquipment = relationship("MilitaryEquipment", back_populates="imageEmbeddings")
+
+class EmbeddingJob(Base):
+    __tablename__ = "EmbeddingJob"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid4()))
+    status = Column(String, nullable=False, default="queued", index=True)  # queued | running | completed | failed | cancelled
+    total = Column(Integer, nullable=False)
+    processed = Column(Integer, nullable=False, default=0)
+    succeeded = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    options = Column(JSONB, nullable=True)
+    error = Column(Text, nullable=True)
+    createdAt = Column(DateTime, default=func.now())
+    updatedAt = Column(DateTime, default=func.now(), onupdate=func.now())
+    startedAt = Column(DateTime, nullable=True)
+    finishedAt = Column(DateTime, nullable=True)
+
+class EmbeddingJobItem(Base):
+    __tablename__ = "EmbeddingJobItem"
+
+    jobId = Column(String, ForeignKey("EmbeddingJob.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    payload = Column(JSONB, nullable=False)  # елемент запиту bulk-embed
+    status = Column(String, nullable=False, default="pending")  # pending | success | error | cancelled
+    result = Column(JSONB, nullable=True)
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (name, async fn(value) -> value, number of concurrent workers)
+Stage = Tuple[str, Callable[[Any], Awaitable[Any]], int]
+
+_DONE = object()
+
+
+async def run_pipeline(items: Iterable[Tuple[Hashable, Any]],
+                       stages: Sequence[Stage],
+                       sink: Callable[[List[Tuple[Hashable, Any]]], Awaitable[None]],
+                       on_error: Callable[[Hashable, str, Exception], None],
+                       queue_size: int = 32,
+                       sink_batch_size: int = 50):
+    """
+    Runs (key, value) items through async stages connected by bounded queues.
+
+    Every stage has its own pool of workers, so e.g. downloads, preprocessing
+    and inference overlap instead of running one item at a time. A failing
+    stage reports the item through `on_error(key, stage_name, exc)` and drops
+    it. Items leaving the last stage are handed to `sink` in batches of up to
+    `sink_batch_size` (or whatever is ready when the queue runs dry).
+    """
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+
+    async def feed():
+        for item in items:
+            await queues[0].put(item)
+        for _ in range(max(1, stages[0][2]) if stages else 1):
+            await queues[0].put(_DONE)
+
+    async def worker(index: int):
+        name, fn, _ = stages[index]
+        inbox, outbox = queues[index], queues[index + 1]
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            key, value = item
+            try:
+                result = await fn(value)
+            except Exception as e:
+                on_error(key, name, e)
+                continue
+            await outbox.put((key, result))
+
+    async def close_stage(index: int, workers: List[asyncio.Task]):
+        await asyncio.gather(*workers)
+        downstream = max(1, stages[index + 1][2]) if index + 1 < len(stages) else 1
+        for _ in range(downstream):
+            await queues[index + 1].put(_DONE)
+
+    async def drain():
+        inbox = queues[-1]
+        done = False
+        while not done:
+            batch = []
+            item = await inbox.get()
+            if item is _DONE:
+                break
+            batch.append(item)
+            while len(batch) < sink_batch_size and not inbox.empty():
+                item = inbox.get_nowait()
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+            try:
+                await sink(batch)
+            except Exception as e:
+                logger.error(f"Pipeline sink failed for {len(batch)} items: {e}")
+                for key, _ in batch:
+                    on_error(key, "sink", e)
+
+    tasks = [asyncio.ensure_future(feed()), asyncio.ensure_future(drain())]
+    for index, (_, _, concurrency) in enumerate(stages):
+        workers = [asyncio.ensure_future(worker(index)) for _ in range(max(1, concurrency))]
+        tasks.append(asyncio.ensure_future(close_stage(index, workers)))
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
@@ -0,0 +1,96 @@
+"""
+Batched CLIP image preprocessing into a preallocated float32 buffer.
+
+Reproduces CLIP's `preprocess` transform (bicubic resize of the shorter side,
+center crop, RGB, scale to [0, 1], per-channel normalize) with PIL + NumPy, and
+writes each image straight into its row of a (N, 3, size, size) batch.
+
+JPEGs are decoded with `Image.draft`, which lets libjpeg scale by 1/2, 1/4 or
+1/8 while decoding. The scale is chosen so the shorter side stays at least
+`draft_scale * size` pixels, so the bicubic resize still downsamples by 2x or
+more. On 640px..4000px photos with the default `draft_scale=2`, the
+preprocessed tensors differ from the full-resolution path by a mean absolute
+error of ~0.003 (max ~0.15) in normalized units, and decoding is ~3.5x faster.
+The accepted embedding tolerance is cosine similarity >= 0.995 against the
+reference path. `drift_check.py` measures it on a fixture set. With
+`draft_scale=0`, draft decoding is off and the output matches the reference
+transform up to float rounding.
+"""
+import io
+from concurrent.futures import Executor
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+CLIP_MEAN = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32)
+CLIP_STD = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32)
+
+# (x / 255 - mean) / std == x * scale - offset
+_SCALE = (1.0 / (255.0 * CLIP_STD))[:, None, None]
+_OFFSET = (CLIP_MEAN / CLIP_STD)[:, None, None]
+
+
+def decode_image(image_bytes: bytes, size: int = 224, draft_scale: int = 2) -> Image.Image:
+    """Decodes to RGB, letting the JPEG decoder skip resolution that the resize would throw away"""
+    image = Image.open(io.BytesIO(image_bytes))
+    if draft_scale > 0 and image.format == "JPEG":
+        image.draft("RGB", (size * draft_scale, size * draft_scale))
+    return image.convert("RGB")
+
+
+def resize_and_crop(image: Image.Image, size: int = 224) -> Image.Image:
+    """torchvision Resize(size, BICUBIC) + CenterCrop(size), same rounding as torchvision"""
+    width, height = image.size
+    if width <= height:
+        new_width, new_height = size, int(size * height / width)
+    else:
+        new_width, new_height = int(size * width / height), size
+    if (new_width, new_height) != (width, height):
+        image = image.resize((new_width, new_height), Image.BICUBIC)
+    left = int(round((new_width - size) / 2.0))
+    top = int(round((new_height - size) / 2.0))
+    return image.crop((left, top, left + size, top + size))
+
+
+def preprocess_into(image_bytes: bytes, out: np.ndarray, size: int = 224, draft_scale: int = 2):
+    """Decodes one image and writes its normalized CHW tensor into `out` (shape (3, size, size))"""
+    pixels = np.asarray(resize_and_crop(decode_image(image_bytes, size, draft_scale), size))
+    np.multiply(pixels.transpose(2, 0, 1), _SCALE, out=out)
+    out -= _OFFSET
+
+
+def preprocess_batch(images: Sequence[bytes], out: Optional[np.ndarray] = None, size: int = 224,
+                     draft_scale: int = 2, executor: Optional[Executor] = None) -> Tuple[np.ndarray, Dict[int, Exception]]:
+    """
+    Preprocesses a batch of encoded images into `out` (allocated if not given).
+
+    Each image is decoded on its own, so a corrupt or unsupported one does not
+    fail the rest: returns the tensors of the images that decoded, packed in
+    input order into `out[:len(images) - len(failed)]`, and `failed`, the
+    exception of every image that did not, by its index in `images`. With an
+    `executor` the images are decoded in parallel; PIL releases the GIL while
+    decoding and resizing, so a thread pool is enough.
+    """
+    if out is None:
+        out = np.empty((len(images), 3, size, size), dtype=np.float32)
+    elif out.shape[0] < len(images) or out.shape[1:] != (3, size, size):
+        raise ValueError(f"Buffer of shape {out.shape} cannot hold {len(images)} images of size {size}")
+
+    def run(index: int) -> Optional[Exception]:
+        try:
+            preprocess_into(images[index], out[index], size, draft_scale)
+        except Exception as e:
+            return e
+        return None
+
+    if executor is not None and len(images) > 1:
+        errors = list(executor.map(run, range(len(images))))
+    else:
+        errors = [run(index) for index in range(len(images))]
+    failed = {index: error for index, error in enumerate(errors) if error is not None}
+    if not failed:
+        return out[:len(images)], failed
+    decoded = [index for index in range(len(images)) if index not in failed]
+    out[:len(decoded)] = out[decoded]
+    return out[:len(decoded)], failed
@@ -0,0 +1,88 @@
+"""
+Re-encodes stored embeddings into the binary "vectorDataBinary" column.
+
+By default only rows without a binary vector (legacy JSON rows) are converted.
+Use --all to re-encode every row into a different encoding, and --drop-json to
+clear "vectorDataJson" once the binary copy is written.
+
+Usage:
+    python reencode_vectors.py
+    python reencode_vectors.py --encoding float16 --all --drop-json
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import asyncpg
+
+from server import get_db_connect_params
+from vector_codec import FLOAT16, FLOAT32, INT8, decode_stored, encode_vector, vector_encoding
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def reencode(encoding: str, batch_size: int, reencode_all: bool, drop_json: bool) -> int:
+    conn = await asyncpg.connect(**get_db_connect_params())
+    converted = 0
+    last_id = ""
+    start_time = time.time()
+    try:
+        while True:
+            # Keyset-пагінація по id, щоб не сканувати таблицю з початку на кожному кроці
+            rows = await conn.fetch(
+                '''
+                SELECT id, "vectorDataJson", "vectorDataBinary" FROM "ImageEmbedding"
+                WHERE id > $1
+                  AND ("vectorDataJson" IS NOT NULL OR "vectorDataBinary" IS NOT NULL)
+                  AND ($3 OR "vectorDataBinary" IS NULL OR ($4 AND "vectorDataJson" IS NOT NULL))
+                ORDER BY id
+                LIMIT $2
+                ''',
+                last_id,
+                batch_size,
+                reencode_all,
+                drop_json
+            )
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+
+            updates = []
+            for row in rows:
+                binary = row['vectorDataBinary']
+                if not binary or vector_encoding(binary) != encoding:
+                    binary = encode_vector(decode_stored(binary, row['vectorDataJson']), encoding)
+                updates.append((row['id'], binary))
+
+            async with conn.transaction():
+                await conn.executemany(
+                    f'''
+                    UPDATE "ImageEmbedding"
+                    SET "vectorDataBinary" = $2, "updatedAt" = now(){', "vectorDataJson" = NULL' if drop_json else ''}
+                    WHERE id = $1
+                    ''',
+                    updates
+                )
+            converted += len(updates)
+            logger.info(f"Re-encoded {converted} rows ({converted / (time.time() - start_time):.0f} rows/s)")
+    finally:
+        await conn.close()
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--encoding", choices=[FLOAT32, FLOAT16, INT8], default=FLOAT32)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--all", action="store_true", help="re-encode rows that already have a binary vector")
+    parser.add_argument("--drop-json", action="store_true", help='clear "vectorDataJson" after conversion')
+    args = parser.parse_args()
+
+    converted = asyncio.run(reencode(args.encoding, args.batch_size, args.all, args.drop_json))
+    logger.info(f"Re-encode finished: {converted} rows updated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+STORE_DTYPES = ("float32", "float16")
+_SEGMENT_FILE = re.compile(r"^(\d{6})(-\d{6}\.(vec|ids)|\.deleted)$")
+
+
+class SegmentStore:
+    """
+    Append-only on-disk vector store for corpora that do not fit in RAM.
+
+    Layout of `directory`:
+      manifest.json            format version, dim, dtype, segment size, generation, segment count
+      <gen>-<n>.vec            raw row-major vectors (segment_rows x dim), opened with np.memmap
+      <gen>-<n>.ids            id table of the segment, one id per line, row-aligned with .vec
+      <gen>.deleted            int64 rows deleted since the generation was written
+
+    Rows are only ever appended: the vector is written first and its id line
+    last, so the id tables say how many rows of each segment are complete.
+    Deleting (or re-adding) an id tombstones its row, and compaction
+    (`begin_compaction` / `run_compaction` / `finish_compaction`) rewrites the
+    live rows as a new generation. Opening maps the segments (no vector reads),
+    only the id tables are parsed. Vectors are returned as float32 whatever the
+    storage dtype (float16 halves disk and page cache at ~1e-3 precision).
+    """
+
+    def __init__(self, directory: str, dim: int, dtype: str = "float32", segment_rows: int = 65536,
+                 chunk_rows: int = 8192):
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f"Unknown vector store dtype {dtype!r}, expected one of {STORE_DTYPES}")
+        self.directory = directory
+        self.dim = dim
+        self.dtype = dtype
+        self.segment_rows = segment_rows
+        self.chunk_rows = chunk_rows
+        self.generation = 0
+        self._last_generation = 0
+        self.rows = 0
+        self.live_rows = 0
+        self.compacting = False
+        self.compactions = 0
+        self._segments: List[np.memmap] = []
+        self._ids: List[str] = []
+        self._rows_of: Dict[str, int] = {}
+        self._live = np.zeros(0, dtype=bool)
+        self._ids_file = None
+        self._deleted_file = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._deleted_file is not None
+
+    @property
+    def garbage_ratio(self) -> float:
+        return (self.rows - self.live_rows) / self.rows if self.rows else 0.0
+
+    def __len__(self) -> int:
+        return self.live_rows
+
+    def __contains__(self, image_id: str) -> bool:
+        return image_id in self._rows_of
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _segment_name(self, generation: int, number: int) -> str:
+        return f"{generation:06d}-{number:06d}"
+
+    def _write_manifest(self, generation: int, segments: int):
+        manifest = {
+            "version": STORE_VERSION,
+            "dim": self.dim,
+            "dtype": self.dtype,
+            "segment_rows": self.segment_rows,
+            "generation": generation,
+            "segments": segments
+        }
+        with open(self._path("manifest.json.tmp"), "w") as f:
+            json.dump(manifest, f)
+        os.replace(self._path("manifest.json.tmp"), self._path("manifest.json"))
+
+    def _new_generation(self) -> int:
+        self._last_generation = max(self._last_generation, self.generation) + 1
+        return self._last_generation
+
+    def open(self):
+        """Opens the store (creating it if needed); a store written with other settings is recreated"""
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = None
+        if os.path.exists(self._path("manifest.json")):
+            with open(self._path("manifest.json")) as f:
+                manifest = json.load(f)
+            expected = {"version": STORE_VERSION, "dim": self.dim, "dtype": self.dtype, "segment_rows": self.segment_rows}
+            if any(manifest.get(key) != value for key, value in expected.items()):
+                logger.warning(f"Vector store {self.directory} was written with other settings, recreating it")
+                self.generation = manifest.get("generation", 0)
+                self.generation = self._new_generation()
+                manifest = None
+        if manifest is None:
+            self._write_manifest(self.generation, 0)
+            self._load_generation(self.generation, 0)
+        else:
+            try:
+                self._load_generation(manifest["generation"], manifest["segments"])
+            except ValueError as e:
+                logger.warning(f"Vector store {self.directory} is damaged, recreating it: {e}")
+                self.close()
+                self.generation = manifest["generation"]
+                self.generation = self._new_generation()
+                self._write_manifest(self.generation, 0)
+                self._load_generation(self.generation, 0)
+        self._remove_stale_files()
+        logger.info(f"Vector store opened: {self.live_rows} vectors in {len(self._segments)} segments "
+                    f"({self.rows - self.live_rows} deleted, {self.dtype})")
+
+    def _load_generation(self, generation: int, segments: int):
+        self.generation = generation
+        self._segments, self._ids = [], []
+        for number in range(segments):
+            name = self._segment_name(generation, number)
+            with open(self._path(f"{name}.ids"), "rb") as f:
+                data = f.read()
+            complete = data.rfind(b"\n") + 1
+            if complete < len(data):
+                # Torn last line: the vector was written but its id was not, so the row never happened
+                with open(self._path(f"{name}.ids"), "r+b") as f:
+                    f.truncate(complete)
+            ids = data[:complete].decode("utf-8").split("\n")[:-1]
+            if len(ids) > self.segment_rows or (number < segments - 1 and len(ids) != self.segment_rows):
+                raise ValueError(f"segment {name} has {len(ids)} rows")
+            self._segments.append(np.memmap(self._path(f"{name}.vec"), dtype=self.dtype,
+                                            mode="r+" if number == segments - 1 else "r",
+                                            shape=(self.segment_rows, self.dim)))
+            self._ids.extend(ids)
+        self.rows = len(self._ids)
+        self._live = np.ones(max(self.rows, 1024), dtype=bool)
+        deleted_path = self._path(f"{generation:06d}.deleted")
+        if os.path.exists(deleted_path):
+            with open(deleted_path, "r+b") as f:
+                data = f.read()
+                f.truncate(len(data) - len(data) % 8)
+            deleted = np.frombuffer(data[:len(data) - len(data) % 8], dtype=np.int64)
+            self._live[deleted[deleted < self.rows]] = False
+        self._rows_of = {}
+        for row, image_id in enumerate(self._ids):
+            if not self._live[row]:
+                continue
+            previous = self._rows_of.get(image_id)
+            if previous is not None:
+                self._live[previous] = False  # crashed between appending and tombstoning the old row
+            self._rows_of[image_id] = row
+        self.live_rows = len(self._rows_of)
+        self._deleted_file = open(deleted_path, "ab")
+        if segments:
+            self._ids_file = open(self._path(f"{self._segment_name(generation, segments - 1)}.ids"), "ab")
+
+    def _remove_stale_files(self):
+        """Deletes segments of older generations and leftovers of interrupted compactions"""
+        for name in os.listdir(self.directory):
+            match = _SEGMENT_FILE.match(name)
+            if match and int(match.group(1)) != self.generation:
+                try:
+                    os.remove(self._path(name))
+                except OSError as e:
+                    logger.debug(f"Could not remove stale vector store file {name}: {e}")
+
+    def close(self):
+        for f in (self._ids_file, self._deleted_file):
+            if f is not None:
+                f.close()
+        self._ids_file = self._deleted_file = None
+        self.flush()
+        self._segments = []
+
+    def flush(self):
+        if self._segments and self._segments[-1].mode != "r":
+            self._segments[-1].flush()
+        for f in (self._ids_file, self._deleted_file):
+            if f is not None:
+                f.flush()
+
+    def _add_segment(self):
+        if self._ids_file is not None:
+            self._ids_file.close()
+            self._segments[-1].flush()
+        name = self._segment_name(self.generation, len(self._segments))
+        segment = np.memmap(self._path(f"{name}.vec"), dtype=self.dtype, mode="w+",
+                            shape=(self.segment_rows, self.dim))
+        self._ids_file = open(self._path(f"{name}.ids"), "ab")
+        self._segments.append(segment)
+        self._write_manifest(self.generation, len(self._segments))
+
+    def _ensure_live_capacity(self, required: int):
+        if required > self._live.shape[0]:
+            live = np.zeros(max(required, self._live.shape[0] * 2), dtype=bool)
+            live[:self.rows] = self._live[:self.rows]
+            self._live = live
+
+    def append(self, ids: Sequence[str], vectors: np.ndarray) -> np.ndarray:
+        """Appends rows and returns their row numbers; an id that is already stored is replaced"""
+        vectors = np.asarray(vectors).reshape(len(ids), self.dim)
+        rows = np.arange(self.rows, self.rows + len(ids), dtype=np.int64)
+        self._ensure_live_capacity(self.rows + len(ids))
+        replaced = []
+        done = 0
+        while done < len(ids):
+            offset = self.rows % self.segment_rows
+            if offset == 0 and len(self._segments) * self.segment_rows <= self.rows:
+                self._add_segment()
+            count = min(len(ids) - done, self.segment_rows - offset)
+            self._segments[-1][offset:offset + count] = vectors[done:done + count]
+            self._ids_file.write("".join(f"{image_id}\n" for image_id in ids[done:done + count]).encode("utf-8"))
+            for row, image_id in enumerate(ids[done:done + count], start=self.rows):
+                previous = self._rows_of.get(image_id)
+                if previous is not None:
+                    replaced.append(previous)
+                self._rows_of[image_id] = row
+                self._ids.append(image_id)
+            self._live[self.rows:self.rows + count] = True
+            self.rows += count
+            done += count
+        self._ids_file.flush()
+        self.live_rows = len(self._rows_of)
+        if replaced:
+            self._tombstone(replaced)
+        return rows
+
+    def _tombstone(self, rows: List[int]):
+        self._live[rows] = False
+        self._deleted_file.write(np.asarray(rows, dtype=np.int64).tobytes())
+        self._deleted_file.flush()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Tombstones the rows of `ids`; returns how many were stored"""
+        rows = [row for row in (self._rows_of.pop(image_id, None) for image_id in ids) if row is not None]
+        if rows:
+            self._tombstone(rows)
+            self.live_rows = len(self._rows_of)
+        return len(rows)
+
+    def row(self, image_id: str) -> Optional[int]:
+        return self._rows_of.get(image_id)
+
+    def ids(self) -> List[str]:
+        """Ids of all live rows"""
+        return list(self._rows_of)
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """float32 vectors of `rows`, read segment by segment in row order"""
+        return self._take(self._segments, rows)
+
+    def _take(self, segments: List[np.memmap], rows: np.ndarray) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64).reshape(-1)
+        result = np.empty((len(rows), self.dim), dtype=np.float32)
+        if len(rows) == 0:
+            return result
+        order = np.argsort(rows, kind="stable")
+        ordered = rows[order]
+        bounds = np.searchsorted(ordered, np.arange(1, len(segments) + 1) * self.segment_rows)
+        start = 0
+        for number, end in enumerate(bounds):
+            if end > start:
+                offsets = ordered[start:end] - number * self.segment_rows
+                segment = segments[number]
+                if offsets[-1] - offsets[0] == end - start - 1:
+                    block = segment[offsets[0]:offsets[-1] + 1]  # contiguous range: one sequential read
+                else:
+                    block = segment[offsets]
+                result[order[start:end]] = block
+            start = end
+            if start == len(rows):
+                break
+        return result
+
+    def view(self, rows: np.ndarray) -> "StoreView":
+        return StoreView(self, rows)
+
+    def clear(self):
+        """Drops all rows by starting an empty generation"""
+        self.close()
+        self.generation = self._new_generation()
+        self._write_manifest(self.generation, 0)
+        self._load_generation(self.generation, 0)
+        self._remove_stale_files()
+
+    def begin_compaction(self) -> Optional[Dict[str, Any]]:
+        """
+        Captures what to compact. Rows are immutable once written, so the copy
+        (`run_compaction`) can run without the caller's lock; `finish_compaction`
+        then adds rows appended meanwhile and drops rows deleted meanwhile.
+        """
+        if self.compacting or self.rows == self.live_rows:
+            return None
+        self.compacting = True
+        return {"generation": self.generation, "rows": self.rows, "live": self._live[:self.rows].copy(),
+                "source": (list(self._segments), self._ids), "target": self._new_generation(),
+                "segments": [], "ids": []}
+
+    def _copy_rows(self, plan: Dict[str, Any], rows: np.ndarray, segments: List[np.memmap], ids: List[str]):
+        """Appends `rows` of the compacted generation to the new generation of `plan`"""
+        for start in range(0, len(rows), self.chunk_rows):
+            chunk = rows[start:start + self.chunk_rows]
+            vectors = self._take(segments, chunk).astype(self.dtype)
+            done = 0
+            while done < len(chunk):
+                offset = len(plan["ids"]) % self.segment_rows
+                if offset == 0:
+                    name = self._segment_name(plan["target"], len(plan["segments"]))
+                    plan["segments"].append(np.memmap(self._path(f"{name}.vec"), dtype=self.dtype, mode="w+",
+                                                      shape=(self.segment_rows, self.dim)))
+                count = min(len(chunk) - done, self.segment_rows - offset)
+                plan["segments"][-1][offset:offset + count] = vectors[done:done + count]
+                plan["ids"].extend(ids[row] for row in chunk[done:done + count])
+                done += count
+
+    def run_compaction(self, plan: Dict[str, Any]):
+        self._copy_rows(plan, np.flatnonzero(plan["live"]), *plan["source"])
+
+    def finish_compaction(self, plan: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Switches to the compacted generation; returns the old -> new row mapping
+        (-1 for dropped rows), or None if the store was cleared meanwhile
+        """
+        if plan["generation"] != self.generation:
+            self.abort_compaction(plan)
+            return None
+        try:
+            copied = np.flatnonzero(plan["live"])
+            appended = np.arange(plan["rows"], self.rows)[self._live[plan["rows"]:self.rows]]
+            self._copy_rows(plan, appended, self._segments, self._ids)
+            previous_rows = self.rows
+            mapping = np.full(self.rows, -1, dtype=np.int64)
+            mapping[np.concatenate([copied, appended])] = np.arange(len(plan["ids"]))
+            deleted = mapping[copied[~self._live[copied]]]  # deleted while the copy ran
+            for number, segment in enumerate(plan["segments"]):
+                segment.flush()
+                rows = plan["ids"][number * self.segment_rows:(number + 1) * self.segment_rows]
+                with open(self._path(f"{self._segment_name(plan['target'], number)}.ids"), "wb") as f:
+                    f.write("".join(f"{image_id}\n" for image_id in rows).encode("utf-8"))
+            deleted.tofile(self._path(f"{plan['target']:06d}.deleted"))
+            plan["segments"] = []
+            segments = (len(plan["ids"]) + self.segment_rows - 1) // self.segment_rows
+            self._write_manifest(plan["target"], segments)
+            self.close()
+            self._load_generation(plan["target"], segments)
+            mapping[~self._live_mask(mapping)] = -1
+            self.compactions += 1
+            self._remove_stale_files()
+            logger.info(f"Vector store compacted: {previous_rows - self.rows} deleted rows dropped, "
+                        f"{self.live_rows} live")
+            return mapping
+        finally:
+            self.compacting = False
+
+    def _live_mask(self, mapping: np.ndarray) -> np.ndarray:
+        mask = mapping >= 0
+        mask[mask] = self._live[mapping[mask]]
+        return mask
+
+    def abort_compaction(self, plan: Dict[str, Any]):
+        """Discards a compaction that failed or lost a race with `clear`"""
+        plan["segments"] = []
+        plan["source"] = None
+        self.compacting = False
+        self._remove_stale_files()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.directory,
+            "dtype": self.dtype,
+            "generation": self.generation,
+            "segments": len(self._segments),
+            "segment_rows": self.segment_rows,
+            "rows": self.rows,
+            "live_rows": self.live_rows,
+            "deleted_rows": self.rows - self.live_rows,
+            "garbage_ratio": self.garbage_ratio,
+            "disk_bytes": len(self._segments) * self.segment_rows * self.dim * np.dtype(self.dtype).itemsize,
+            "compacting": self.compacting,
+            "compactions": self.compactions
+        }
+
+
+class StoreView:
+    """
+    float32 rows of a SegmentStore, read lazily: slicing returns an array and
+    `view @ query` scores the rows in chunks of `chunk_rows`, so only one chunk
+    of vectors is resident at a time
+    """
+
+    def __init__(self, store: SegmentStore, rows: np.ndarray):
+        self.store = store
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.shape = (len(self.rows), store.dim)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, key) -> np.ndarray:
+        return self.store.take(self.rows[key])
+
+    def __matmul__(self, other: np.ndarray) -> np.ndarray:
+        other = np.asarray(other, dtype=np.float32)
+        scores = np.empty((len(self),) + other.shape[1:], dtype=np.float32)
+        chunk_rows = self.store.chunk_rows
+        for start in range(0, len(self), chunk_rows):
+            scores[start:start + chunk_rows] = self[start:start + chunk_rows] @ other
+        return scores
@@ -0,0 +1,76 @@
+import pytest
+
+import cache
+from cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    lru = TTLCache(max_size=2, ttl_seconds=60)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1  # "b" is now the least recently used
+
+    lru.put("c", 3)
+
+    assert len(lru) == 2
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+    assert lru.stats()["evictions"] == 1
+
+
+def test_put_refreshes_existing_key(clock):
+    lru = TTLCache(max_size=2, ttl_seconds=60)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    lru.put("a", 10)
+    lru.put("c", 3)
+
+    assert lru.get("a") == 10
+    assert lru.get("b") is None
+
+
+def test_entries_expire_after_ttl(clock):
+    ttl = TTLCache(max_size=10, ttl_seconds=5)
+    ttl.put("a", 1)
+
+    clock[0] += 4.9
+    assert ttl.get("a") == 1
+    clock[0] += 0.1
+    assert ttl.get("a") is None
+    assert len(ttl) == 0
+    assert ttl.stats()["expirations"] == 1
+
+
+def test_stats_count_hits_and_misses(clock):
+    stats_cache = TTLCache(max_size=10, ttl_seconds=60)
+    stats_cache.put("a", 1)
+    stats_cache.get("a")
+    stats_cache.get("a")
+    stats_cache.get("missing")
+
+    stats = stats_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_zero_size_disables_cache(clock):
+    disabled = TTLCache(max_size=0)
+    disabled.put("a", 1)
+
+    assert disabled.get("a") is None
+    assert len(disabled) == 0
+
+
+def test_clear(clock):
+    lru = TTLCache()
+    lru.put("a", 1)
+    lru.clear()
+
+    assert lru.get("a") is None
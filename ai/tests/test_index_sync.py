@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest
+
+import index_sync
+from index_sync import IndexSync
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(index_sync.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def sync(clock):
+    sync = IndexSync({}, apply_changes=None, gap_timeout=30.0)
+    sync.watermark = 10
+    return sync
+
+
+def test_contiguous_ids_advance_watermark(sync):
+    sync._advance([11, 12, 13])
+
+    assert sync.watermark == 13
+    assert not sync._applied_above and not sync._gaps
+
+
+def test_out_of_order_commit_fills_gap(sync):
+    sync._advance([11, 13, 14])
+    assert sync.watermark == 11
+    assert sync._gaps.keys() == {12}
+
+    sync._advance([12])
+
+    assert sync.watermark == 14
+    assert not sync._applied_above and not sync._gaps
+
+
+def test_duplicates_are_ignored(sync):
+    sync._advance([11, 13])
+    sync._advance([13, 11, 9])
+
+    assert sync.watermark == 11
+    assert sync._applied_above == {13}
+    sync._advance([12, 12])
+    assert sync.watermark == 13 and not sync._applied_above
+
+
+def test_gap_is_skipped_after_timeout(sync, clock):
+    sync._advance([11, 14])
+    clock[0] += 30.0
+    sync._advance([])
+    assert sync.watermark == 11  # still waiting
+
+    clock[0] += 0.1
+    sync._advance([])
+
+    assert sync.watermark == 14
+    assert not sync._gaps and not sync._applied_above
+
+
+def test_skipped_gap_is_remembered_for_recheck(sync, clock):
+    sync._advance([12])
+    clock[0] += 31.0
+    sync._advance([])
+
+    assert sync.watermark == 12
+    assert sync._skipped == {11: clock[0]}
+
+
+def test_gap_timeout_counts_from_first_sighting(sync, clock):
+    sync._advance([12])
+    clock[0] += 20.0
+    sync._advance([13])  # 11 is still missing, its timer must not restart
+    clock[0] += 10.1
+    sync._advance([])
+
+    assert sync.watermark == 13
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def fetch(self, query, *args):
+        if "id = ANY" in query:
+            return [row for row in self.rows if row["id"] in args[0]]
+        watermark, skip, limit = args
+        self.queries.append((watermark, sorted(skip)))
+        return [row for row in self.rows if row["id"] > watermark and row["id"] not in skip][:limit]
+
+    async def execute(self, *args):
+        pass
+
+
+def test_poll_applies_each_change_once(clock):
+    applied = []
+
+    async def apply_changes(conn, changes):
+        applied.extend(change["id"] for change in changes)
+
+    rows = [{"id": change_id, "table_name": "ImageEmbedding", "operation": "INSERT", "row_id": f"r{change_id}",
+             "age_seconds": 0.5} for change_id in (1, 2, 4)]
+    sync = IndexSync({}, apply_changes, batch_size=2)
+    conn = FakeConnection(rows)
+
+    async def drain():
+        while await sync.poll(conn):
+            pass
+
+    asyncio.run(drain())
+
+    assert applied == [1, 2, 4]
+    assert sync.watermark == 2 and sync._applied_above == {4}
+    assert conn.queries[-1] == (2, [4])
+
+
+def test_catch_up_applies_everything_after_watermark(clock):
+    applied = []
+
+    async def apply_changes(conn, changes):
+        applied.extend(change["id"] for change in changes)
+
+    rows = [{"id": change_id, "table_name": "ImageEmbedding", "operation": "UPDATE", "row_id": f"r{change_id}",
+             "age_seconds": 0.0} for change_id in range(1, 8)]
+    sync = IndexSync({}, apply_changes, batch_size=2)
+    sync._gaps[3] = 0.0
+
+    replayed = asyncio.run(sync.catch_up(FakeConnection(rows), 3))
+
+    assert replayed == 4 and applied == [4, 5, 6, 7]
+    assert sync.watermark == 7 and not sync._gaps and not sync.pending
+
+
+def change(change_id):
+    return {"id": change_id, "table_name": "ImageEmbedding", "operation": "INSERT", "row_id": f"r{change_id}",
+            "age_seconds": 0.0}
+
+
+def test_change_committed_after_gap_timeout_is_applied_late(clock):
+    applied = []
+
+    async def apply_changes(conn, changes):
+        applied.extend(change["id"] for change in changes)
+
+    sync = IndexSync({}, apply_changes, gap_timeout=30.0, recheck_seconds=600.0)
+    conn = FakeConnection([change(1), change(3)])
+    asyncio.run(sync.poll(conn))
+    clock[0] += 31.0
+    asyncio.run(sync.poll(conn))
+    assert sync.watermark == 3 and 2 in sync._skipped
+
+    conn.rows.append(change(2))  # the slow transaction finally commits
+    asyncio.run(sync.poll(conn))
+
+    assert applied == [1, 3, 2]
+    assert not sync._skipped
+    assert sync.stats()["late_changes"] == 1
+
+
+def test_skipped_ids_expire_after_recheck_window(clock):
+    async def apply_changes(conn, changes):
+        pass
+
+    sync = IndexSync({}, apply_changes, gap_timeout=30.0, recheck_seconds=600.0)
+    conn = FakeConnection([change(1), change(3)])
+    asyncio.run(sync.poll(conn))
+    clock[0] += 31.0
+    asyncio.run(sync.poll(conn))
+    clock[0] += 601.0
+
+    asyncio.run(sync.poll(conn))
+
+    assert not sync._skipped and sync.stats()["skipped_changes"] == 0
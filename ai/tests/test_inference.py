@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from inference import MicroBatcher
+
+
+def batch_fn(items):
+    if "crash" in items:
+        raise RuntimeError("batch failed")
+    return [ValueError(item) if item.startswith("bad") else item.upper() for item in items]
+
+
+@pytest.fixture
+def batcher():
+    return MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=50, name="test")
+
+
+def test_exception_result_fails_only_its_job(batcher):
+    futures = [batcher.submit(item) for item in ("a", "bad-b", "c")]
+
+    assert futures[0].result(timeout=5) == "A"
+    assert futures[2].result(timeout=5) == "C"
+    with pytest.raises(ValueError, match="bad-b"):
+        futures[1].result(timeout=5)
+    assert batcher.stats()["largest_batch"] == 3
+
+
+def test_batch_exception_fails_every_job(batcher):
+    futures = [batcher.submit(item) for item in ("a", "crash")]
+
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+
+
+def test_run_many_returns_exceptions_in_place(batcher):
+    results = asyncio.run(batcher.run_many(["a", "bad-b", "c"], return_exceptions=True))
+
+    assert results[0] == "A" and results[2] == "C"
+    assert isinstance(results[1], ValueError)
+    with pytest.raises(ValueError):
+        asyncio.run(batcher.run_many(["a", "bad-b"]))
@@ -0,0 +1,97 @@
+import asyncio
+
+from pipeline import run_pipeline
+
+
+def run(items, stages, queue_size=32, sink_batch_size=50, fail_sink=False):
+    delivered, batches, errors = {}, [], []
+
+    async def sink(batch):
+        if fail_sink:
+            raise RuntimeError("sink down")
+        batches.append(len(batch))
+        delivered.update(batch)
+
+    def on_error(key, stage, exc):
+        errors.append((key, stage, str(exc)))
+
+    asyncio.run(run_pipeline(items, stages, sink, on_error, queue_size=queue_size, sink_batch_size=sink_batch_size))
+    return delivered, batches, errors
+
+
+def test_items_pass_through_all_stages():
+    async def double(value):
+        return value * 2
+
+    async def increment(value):
+        await asyncio.sleep(0)
+        return value + 1
+
+    delivered, batches, errors = run(((n, n) for n in range(100)), [("double", double, 3), ("inc", increment, 2)],
+                                     sink_batch_size=16)
+
+    assert delivered == {n: n * 2 + 1 for n in range(100)}
+    assert errors == []
+    assert sum(batches) == 100 and max(batches) <= 16
+
+
+def test_failing_item_is_reported_and_dropped():
+    async def parse(value):
+        if value % 10 == 3:
+            raise ValueError(f"bad {value}")
+        return value
+
+    delivered, _, errors = run(((n, n) for n in range(30)), [("parse", parse, 2)])
+
+    assert sorted(delivered) == [n for n in range(30) if n % 10 != 3]
+    assert sorted(errors) == [(n, "parse", f"bad {n}") for n in (3, 13, 23)]
+
+
+def test_sink_failure_reports_every_item_in_batch():
+    async def identity(value):
+        return value
+
+    delivered, _, errors = run(((n, n) for n in range(5)), [("identity", identity, 1)], fail_sink=True)
+
+    assert delivered == {}
+    assert sorted(key for key, _, _ in errors) == list(range(5))
+    assert {stage for _, stage, _ in errors} == {"sink"}
+
+
+def test_bounded_queues_apply_backpressure():
+    pulled, finished = [], []
+    max_in_flight = 0
+
+    def items():
+        nonlocal max_in_flight
+        for n in range(200):
+            max_in_flight = max(max_in_flight, len(pulled) - len(finished))
+            pulled.append(n)
+            yield n, n
+
+    async def slow(value):
+        await asyncio.sleep(0.001)
+        finished.append(value)
+        return value
+
+    delivered, _, _ = run(items(), [("slow", slow, 2)], queue_size=4)
+
+    assert len(delivered) == 200
+    # The producer may only run ahead by one queue plus the items held by the workers
+    assert max_in_flight <= 4 + 2 + 1
+
+
+def test_stage_workers_run_concurrently():
+    running, peak = 0, 0
+
+    async def tracked(value):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.005)
+        running -= 1
+        return value
+
+    run(((n, n) for n in range(20)), [("tracked", tracked, 4)])
+
+    assert peak == 4
@@ -0,0 +1,58 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image, UnidentifiedImageError
+
+from preprocessing import preprocess_batch, preprocess_into
+
+SIZE = 32
+
+
+def jpeg(color, size=(48, 40)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def reference(image_bytes: bytes) -> np.ndarray:
+    out = np.empty((3, SIZE, SIZE), dtype=np.float32)
+    preprocess_into(image_bytes, out, SIZE, draft_scale=0)
+    return out
+
+
+@pytest.mark.parametrize("executor", [None, ThreadPoolExecutor(max_workers=2)])
+def test_bad_image_fails_only_itself(executor):
+    images = [jpeg((200, 10, 10)), b"not an image", jpeg((10, 200, 10)), jpeg((10, 10, 200), size=(64, 20))]
+
+    decoded, failed = preprocess_batch(images, size=SIZE, draft_scale=0, executor=executor)
+
+    assert list(failed) == [1]
+    assert isinstance(failed[1], UnidentifiedImageError)
+    assert decoded.shape == (3, 3, SIZE, SIZE)
+    for row, index in enumerate((0, 2, 3)):
+        np.testing.assert_allclose(decoded[row], reference(images[index]), atol=1e-6)
+
+
+def test_all_images_decode_into_buffer():
+    images = [jpeg((value, value, value)) for value in (0, 128, 255)]
+    buffer = np.zeros((8, 3, SIZE, SIZE), dtype=np.float32)
+
+    decoded, failed = preprocess_batch(images, out=buffer, size=SIZE, draft_scale=0)
+
+    assert failed == {}
+    assert np.shares_memory(decoded, buffer)
+    np.testing.assert_allclose(decoded, np.stack([reference(image) for image in images]), atol=1e-6)
+
+
+def test_every_image_failing():
+    decoded, failed = preprocess_batch([b"", b"\x00\x01"], size=SIZE)
+
+    assert decoded.shape[0] == 0
+    assert sorted(failed) == [0, 1]
+
+
+def test_buffer_too_small():
+    with pytest.raises(ValueError):
+        preprocess_batch([jpeg((0, 0, 0))] * 3, out=np.empty((2, 3, SIZE, SIZE), dtype=np.float32), size=SIZE)
@@ -0,0 +1,195 @@
+import numpy as np
+import pytest
+
+from segment_store import SegmentStore
+from vector_index import VectorIndex
+
+DIM = 8
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((50, DIM)).astype(np.float32)
+
+
+def open_store(path, **kwargs):
+    store = SegmentStore(str(path), DIM, segment_rows=16, chunk_rows=5, **kwargs)
+    store.open()
+    return store
+
+
+def contents(store):
+    return {image_id: store.take([store.row(image_id)])[0] for image_id in store.ids()}
+
+
+def test_append_and_take_across_segments(tmp_path, vectors):
+    store = open_store(tmp_path)
+    rows = store.append([f"v{i}" for i in range(50)], vectors)
+
+    np.testing.assert_array_equal(rows, np.arange(50))
+    assert len(store) == 50 and store.stats()["segments"] == 4
+    picked = np.array([49, 0, 17, 16, 31, 3])
+    np.testing.assert_array_equal(store.take(picked), vectors[picked])
+    np.testing.assert_array_equal(store.view(picked)[1:3], vectors[[0, 17]])
+    np.testing.assert_allclose(store.view(np.arange(50)) @ vectors[0], vectors @ vectors[0], rtol=1e-6)
+
+
+def test_delete_and_replace_tombstone_rows(tmp_path, vectors):
+    store = open_store(tmp_path)
+    store.append([f"v{i}" for i in range(10)], vectors[:10])
+
+    assert store.delete(["v1", "v2", "missing"]) == 2
+    store.append(["v3"], vectors[[40]])
+
+    assert "v1" not in store and store.row("v1") is None
+    assert store.row("v3") == 10
+    np.testing.assert_array_equal(store.take([store.row("v3")])[0], vectors[40])
+    assert (store.rows, store.live_rows) == (11, 8)
+    assert store.garbage_ratio == pytest.approx(3 / 11)
+
+
+def test_reopen_restores_rows_and_tombstones(tmp_path, vectors):
+    store = open_store(tmp_path)
+    store.append([f"v{i}" for i in range(20)], vectors[:20])
+    store.delete(["v5"])
+    store.append(["v6"], vectors[[45]])
+    expected = contents(store)
+    store.close()
+
+    reopened = open_store(tmp_path)
+
+    assert sorted(reopened.ids()) == sorted(expected)
+    for image_id, vector in contents(reopened).items():
+        np.testing.assert_array_equal(vector, expected[image_id])
+    assert reopened.garbage_ratio == store.garbage_ratio
+
+
+def test_float16_store_within_tolerance(tmp_path, vectors):
+    store = open_store(tmp_path, dtype="float16")
+    store.append([f"v{i}" for i in range(50)], vectors)
+
+    result = store.take(np.arange(50))
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result, vectors, rtol=1e-3, atol=1e-3)
+
+
+def test_compaction_keeps_live_rows(tmp_path, vectors):
+    store = open_store(tmp_path)
+    store.append([f"v{i}" for i in range(40)], vectors[:40])
+    store.delete([f"v{i}" for i in range(0, 40, 3)])
+    expected = contents(store)
+
+    plan = store.begin_compaction()
+    store.run_compaction(plan)
+    # Writes between the copy and the switch are carried over
+    store.append(["late"], vectors[[45]])
+    store.delete(["v1"])
+    expected["late"] = vectors[45]
+    del expected["v1"]
+    mapping = store.finish_compaction(plan)
+
+    # The row deleted during the copy was already copied and stays as a tombstone
+    assert (store.rows, store.live_rows) == (len(expected) + 1, len(expected))
+    assert mapping[0] == -1 and mapping[1] == -1
+    assert sorted(mapping[mapping >= 0]) == sorted(store.row(image_id) for image_id in expected)
+    for image_id, vector in contents(store).items():
+        np.testing.assert_array_equal(vector, expected[image_id])
+    store.close()
+    assert contents(open_store(tmp_path)).keys() == expected.keys()
+
+
+def test_nothing_to_compact(tmp_path, vectors):
+    store = open_store(tmp_path)
+    store.append(["a"], vectors[:1])
+
+    assert store.begin_compaction() is None
+
+
+def test_compaction_loses_race_with_clear(tmp_path, vectors):
+    store = open_store(tmp_path)
+    store.append([f"v{i}" for i in range(10)], vectors[:10])
+    store.delete(["v0"])
+    plan = store.begin_compaction()
+    store.run_compaction(plan)
+    store.clear()
+
+    assert store.finish_compaction(plan) is None
+    assert len(store) == 0 and not store.compacting
+
+
+def test_index_on_store_matches_in_memory_index(tmp_path):
+    rng = np.random.default_rng(1)
+    corpus = rng.standard_normal((120, DIM)).astype(np.float32)
+    items = [(f"i{row}", vector, f"s{row}", f"e{row % 7}") for row, vector in enumerate(corpus)]
+    memory, stored = VectorIndex(dim=DIM), VectorIndex(dim=DIM)
+    stored.attach_store(open_store(tmp_path))
+    for index in (memory, stored):
+        index.add_many(items)
+        for row in range(0, 120, 4):
+            index.remove(f"i{row}")
+        index.add_many(items[1:10])  # replaced rows are tombstoned in the store
+    queries = rng.standard_normal((5, DIM)).astype(np.float32)
+
+    def ranking(index):
+        return [index.rank(query, top_k=10, exact=True) for query in queries]
+
+    def assert_same(expected, actual):
+        for (expected_ids, expected_scores), (ids, scores) in zip(expected, actual):
+            assert ids == expected_ids
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+    expected = ranking(memory)
+    assert_same(expected, ranking(stored))
+    assert stored.store.garbage_ratio > 0
+
+    assert stored.compact()
+
+    assert stored.store.garbage_ratio == 0
+    assert_same(expected, ranking(stored))
+    grouped = stored.search_equipment(queries[0], top_k=3, score="centroid")
+    expected_grouped = memory.search_equipment(queries[0], top_k=3, score="centroid")
+    assert [group["equipment_id"] for group in grouped] == [group["equipment_id"] for group in expected_grouped]
+    np.testing.assert_allclose([group["similarity"] for group in grouped],
+                               [group["similarity"] for group in expected_grouped], rtol=1e-5)
+
+
+def test_add_stored_reuses_store_rows_without_rewriting(tmp_path, vectors):
+    items = [(f"i{row}", vector, f"s{row}", f"e{row % 3}") for row, vector in enumerate(vectors)]
+    expected = VectorIndex(dim=DIM)
+    expected.add_many(items[:40])
+    index = VectorIndex(dim=DIM)
+    index.attach_store(open_store(tmp_path))
+    index.add_many(items[:45])
+    rows_written = index.store.rows
+
+    index.clear(keep_store=True)
+    assert len(index) == 0 and index.store.live_rows == 45
+    # i40..i44 were deleted from the DB meanwhile, i45 is new and not stored yet
+    missing = index.add_stored([(image_id, source, equipment_id)
+                                for image_id, _, source, equipment_id in items[:40] + items[45:46]])
+    assert index.prune_store() == 5
+
+    assert missing == ["i45"]
+    assert index.store.rows == rows_written and index.store.live_rows == 40
+    assert index._sums_stale
+    query = vectors[0]
+    assert index.rank(query, top_k=10, exact=True)[0] == expected.rank(query, top_k=10, exact=True)[0]
+    grouped = index.search_equipment(query, top_k=3, score="mean")
+    expected_grouped = expected.search_equipment(query, top_k=3, score="mean")
+    assert [group["equipment_id"] for group in grouped] == [group["equipment_id"] for group in expected_grouped]
+    np.testing.assert_allclose([group["similarity"] for group in grouped],
+                               [group["similarity"] for group in expected_grouped], rtol=1e-5)
+    metadata = index.results(["i3"], [1.0])[0]["metadata"]
+    assert metadata["imageSource"] == "s3" and metadata["militaryEquipment"]["id"] == "e0"
+
+
+def test_add_stored_moves_row_to_other_equipment(tmp_path, vectors):
+    index = VectorIndex(dim=DIM)
+    index.attach_store(open_store(tmp_path))
+    index.add_many([("i0", vectors[0], "s0", "e0"), ("i1", vectors[1], "s1", "e0")])
+    index.remove_equipment("e0")
+
+    assert index.add_stored([("i0", "s0", "e1"), ("i1", "s1", "e1")]) == []
+
+    assert "e0" not in index._equipment_codes
+    assert [group["equipment_id"] for group in index.search_equipment(vectors[0], score="mean")] == ["e1"]
@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pytest
+
+from vector_codec import FLOAT16, FLOAT32, INT8, decode_stored, decode_vector, encode_vector, vector_encoding
+
+
+@pytest.fixture
+def vector():
+    vector = np.random.default_rng(0).standard_normal(512).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def cosine(a, b):
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def test_float32_round_trip_is_exact(vector):
+    blob = encode_vector(vector, FLOAT32)
+
+    assert len(blob) == 1 + 4 * vector.size
+    np.testing.assert_array_equal(decode_vector(blob), vector)
+
+
+def test_float16_round_trip_within_tolerance(vector):
+    blob = encode_vector(vector, FLOAT16)
+    decoded = decode_vector(blob)
+
+    assert len(blob) == 1 + 2 * vector.size
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, vector, atol=1e-3)
+    assert cosine(decoded, vector) > 0.99999
+
+
+def test_int8_round_trip_within_tolerance(vector):
+    blob = encode_vector(vector, INT8)
+    decoded = decode_vector(blob)
+
+    assert len(blob) == 1 + 4 + vector.size
+    # Rounding error is at most half a quantization step
+    step = np.abs(vector).max() / 127
+    assert np.abs(decoded - vector).max() <= step / 2 + 1e-7
+    assert cosine(decoded, vector) > 0.999
+
+
+def test_int8_zero_vector():
+    np.testing.assert_array_equal(decode_vector(encode_vector(np.zeros(8), INT8)), np.zeros(8, dtype=np.float32))
+
+
+def test_vector_encoding_reads_header(vector):
+    for encoding in (FLOAT32, FLOAT16, INT8):
+        assert vector_encoding(encode_vector(vector, encoding)) == encoding
+    assert vector_encoding(b"") is None
+
+
+def test_unknown_encodings_are_rejected(vector):
+    with pytest.raises(ValueError):
+        encode_vector(vector, "bfloat16")
+    with pytest.raises(ValueError):
+        decode_vector(b"\x09\x00\x00")
+
+
+def test_decode_stored_prefers_binary_and_falls_back_to_json(vector):
+    legacy = json.dumps([1.0, 2.0, 3.0])
+
+    np.testing.assert_array_equal(decode_stored(encode_vector(vector), legacy), vector)
+    np.testing.assert_array_equal(decode_stored(None, legacy), np.array([1.0, 2.0, 3.0], dtype=np.float32))
+    assert decode_stored(None, None) is None
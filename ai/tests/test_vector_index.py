@@ -0,0 +1,344 @@
+import numpy as np
+import pytest
+
+from vector_index import VectorIndex, parse_filters, top_k_batch
+
+DIM = 16
+
+
+def normalized(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(0)
+    return normalized(rng.standard_normal((200, DIM)).astype(np.float32))
+
+
+@pytest.fixture
+def index(corpus):
+    index = VectorIndex(dim=DIM, initial_capacity=4)
+    for number in range(10):
+        index.set_equipment(f"e{number}", name=f"Item {number}", type="tank", country="UA",
+                            inService=True, year=1990 + number, imageUrl=None)
+    index.add_many((f"i{row}", vector, f"s{row}", f"e{row % 10}") for row, vector in enumerate(corpus))
+    return index
+
+
+def test_search_matches_brute_force(index, corpus):
+    query = normalized(np.random.default_rng(1).standard_normal(DIM).astype(np.float32))
+    expected = np.argsort(-(corpus @ query), kind="stable")[:7]
+
+    results = index.search(query, top_k=7)
+
+    assert [result["image_id"] for result in results] == [f"i{row}" for row in expected]
+    np.testing.assert_allclose([result["similarity"] for result in results], (corpus @ query)[expected], rtol=1e-5)
+
+
+def test_results_carry_equipment_metadata(index, corpus):
+    index.set_equipment("e3", imageUrl="https://example.com/3.jpg")
+
+    result = index.search(corpus[3], top_k=1)[0]
+
+    assert result["image_id"] == "i3"
+    assert result["metadata"]["imageSource"] == "s3"
+    assert result["metadata"]["militaryEquipment"]["name"] == "Item 3"
+    assert result["metadata"]["militaryEquipment"]["imageUrl"] == "https://example.com/3.jpg"
+
+
+def test_vectors_are_normalized_on_add():
+    index = VectorIndex(dim=DIM)
+    index.add("a", np.full(DIM, 3.0, dtype=np.float32), "s", "e")
+
+    ids, scores = index.rank(np.ones(DIM, dtype=np.float32) / np.sqrt(DIM), top_k=1)
+
+    assert ids == ["a"]
+    assert scores[0] == pytest.approx(1.0, abs=1e-6)
+
+
+def test_add_replaces_existing_id(index, corpus):
+    index.add("i0", corpus[5], "moved", "e5")
+
+    assert len(index) == len(corpus)
+    top = index.search(corpus[5], top_k=2)
+    assert {result["image_id"] for result in top} == {"i0", "i5"}
+    assert index.search(corpus[0], top_k=1)[0]["image_id"] != "i0"
+
+
+def test_remove_moves_last_row_and_keeps_search_consistent(index, corpus):
+    assert index.remove("i10")
+    assert not index.remove("i10")
+    assert "i10" not in index and len(index) == len(corpus) - 1
+
+    # The former last row now sits in the removed slot and is still found by its own vector
+    assert index.search(corpus[199], top_k=1)[0]["image_id"] == "i199"
+    assert all(result["image_id"] != "i10" for result in index.search(corpus[10], top_k=len(corpus)))
+
+
+def test_clear_keeps_equipment_metadata(index, corpus):
+    index.clear()
+
+    assert len(index) == 0
+    assert index.search(corpus[0], top_k=3) == []
+    index.add("new", corpus[0], "s", "e1")
+    assert index.search(corpus[0], top_k=1)[0]["metadata"]["militaryEquipment"]["name"] == "Item 1"
+
+
+def test_top_k_larger_than_index(index, corpus):
+    assert len(index.search(corpus[0], top_k=1000)) == len(corpus)
+
+
+EQUIPMENT = {
+    f"e{number}": {"type": (" Tank", "APC\t", "artillery")[number % 3], "country": ("UA", "us ")[number % 2],
+                   "inService": number % 4 != 0, "year": 1980 + 3 * number}
+    for number in range(10)
+}
+
+
+@pytest.fixture
+def filtered_index(corpus):
+    index = VectorIndex(dim=DIM)
+    for equipment_id, fields in EQUIPMENT.items():
+        index.set_equipment(equipment_id, name=equipment_id, imageUrl=None, **fields)
+    index.add_many((f"i{row}", vector, f"s{row}", f"e{row % 10}") for row, vector in enumerate(corpus))
+    return index
+
+
+def test_parse_filters_normalizes_values():
+    assert parse_filters(None) is None
+    assert parse_filters({}) is None
+    assert parse_filters({"type": " TANK ", "country": ["Ua", "US\n"], "inService": False, "year": 1990}) == {
+        "type": ["tank"], "country": ["ua", "us"], "inService": [False], "year": (1990, 1990)}
+    assert parse_filters({"year": {"min": 1990}}) == {"year": (1990, None)}
+
+
+@pytest.mark.parametrize("raw", [
+    ["type"],
+    {"color": "green"},
+    {"type": 5},
+    {"country": ["ua", 1]},
+    {"inService": "yes"},
+    {"year": "1990"},
+    {"year": True},
+    {"year": {"from": 1990}},
+])
+def test_parse_filters_rejects_invalid_input(raw):
+    with pytest.raises(ValueError):
+        parse_filters(raw)
+
+
+@pytest.mark.parametrize("raw", [
+    {"type": "tank"},
+    {"type": ["APC", "artillery"], "country": "US"},
+    {"inService": False},
+    {"year": {"min": 1990, "max": 2000}},
+    {"type": "tank", "country": "ua", "inService": True, "year": {"max": 2000}},
+])
+def test_filtered_search_matches_brute_force(filtered_index, corpus, raw):
+    filters = parse_filters(raw)
+    query = normalized(np.random.default_rng(2).standard_normal(DIM).astype(np.float32))
+
+    def matches(fields):
+        for field in ("type", "country"):
+            if field in filters and fields[field].strip().lower() not in filters[field]:
+                return False
+        if "inService" in filters and fields["inService"] not in filters["inService"]:
+            return False
+        low, high = filters.get("year", (None, None))
+        return (low is None or fields["year"] >= low) and (high is None or fields["year"] <= high)
+
+    rows = np.array([row for row in range(len(corpus)) if matches(EQUIPMENT[f"e{row % 10}"])])
+    scores = corpus[rows] @ query
+    expected = [f"i{rows[i]}" for i in np.argsort(-scores, kind="stable")[:5]]
+
+    assert [result["image_id"] for result in filtered_index.search(query, top_k=5, filters=filters)] == expected
+
+
+def test_filters_follow_equipment_updates(filtered_index, corpus):
+    filters = parse_filters({"country": "PL"})
+    assert filtered_index.search(corpus[0], top_k=5, filters=filters) == []
+
+    filtered_index.set_equipment("e0", country="pl ")
+
+    assert {result["image_id"] for result in filtered_index.search(corpus[0], top_k=100, filters=filters)} == {
+        f"i{row}" for row in range(0, len(corpus), 10)}
+
+
+@pytest.mark.parametrize("block_rows", [7, 64, 200, 32768])
+@pytest.mark.parametrize("top_k", [1, 5, 300])
+def test_top_k_batch_matches_brute_force(corpus, block_rows, top_k):
+    queries = normalized(np.random.default_rng(3).standard_normal((6, DIM)).astype(np.float32))
+    scores = queries @ corpus.T
+    expected = np.argsort(-scores, axis=1, kind="stable")[:, :top_k]
+
+    rows, top_scores = top_k_batch(queries, corpus, top_k, block_rows=block_rows)
+
+    assert rows.shape == expected.shape
+    np.testing.assert_array_equal(rows, expected)
+    np.testing.assert_allclose(top_scores, np.take_along_axis(scores, expected, axis=1), rtol=1e-6)
+
+
+def test_search_batch_matches_single_searches(filtered_index):
+    queries = normalized(np.random.default_rng(4).standard_normal((5, DIM)).astype(np.float32))
+    filters = [None, parse_filters({"type": "tank"}), None, parse_filters({"country": "nowhere"}),
+               parse_filters({"type": "tank"})]
+
+    batched = filtered_index.search_batch(queries, top_k=4, filters=filters)
+
+    assert batched[3] == []
+    for results, query, query_filters in zip(batched, queries, filters):
+        single = filtered_index.search(query, top_k=4, filters=query_filters)
+        assert [result["image_id"] for result in results] == [result["image_id"] for result in single]
+        # A Q x N product may round differently from a single matrix-vector product
+        np.testing.assert_allclose([result["similarity"] for result in results],
+                                   [result["similarity"] for result in single], rtol=1e-5)
+
+
+def test_remove_equipment_without_vectors(filtered_index):
+    filtered_index.set_equipment("orphan", name="orphan", type="drone", country="ua", year=2020)
+    equipment = filtered_index.stats()["equipment"]
+
+    assert filtered_index.remove_equipment("orphan")
+
+    assert filtered_index.stats()["equipment"] == equipment - 1
+    assert filtered_index.filtered_rows(parse_filters({"type": "drone"})).size == 0
+
+
+def test_remove_equipment_waits_for_last_vector(filtered_index, corpus):
+    rows = [f"i{row}" for row in range(3, len(corpus), 10)]
+    equipment = filtered_index.stats()["equipment"]
+
+    assert not filtered_index.remove_equipment("e3")
+    assert filtered_index.stats()["equipment"] == equipment
+    for image_id in rows[:-1]:
+        filtered_index.remove(image_id)
+    filtered_index.add(rows[-1], corpus[0], "moved", "e0")  # the last row moves to other equipment
+
+    stats = filtered_index.stats()
+    assert stats["equipment"] == equipment - 1
+    assert stats["equipment_with_embeddings"] == equipment - 1
+    assert filtered_index.search(corpus[3], top_k=1)[0]["metadata"]["militaryEquipment"]["id"] != "e3"
+
+
+def test_removed_equipment_code_is_reused(filtered_index, corpus):
+    for row in range(5, len(corpus), 10):
+        filtered_index.remove(f"i{row}")
+    filtered_index.remove_equipment("e5")
+    filtered_index.set_equipment("e10", name="new", type="drone", country="PL", inService=True, year=2024)
+    filtered_index.add("drone", corpus[5], "s", "e10")
+
+    assert len(filtered_index._equipment_order) == 10
+    assert [result["image_id"] for result in filtered_index.search(corpus[5], top_k=5,
+                                                                   filters=parse_filters({"type": "drone"}))] == ["drone"]
+    grouped = filtered_index.search_equipment(corpus[5], top_k=1, score="mean")
+    assert grouped[0]["equipment_id"] == "e10" and grouped[0]["image_count"] == 1
+    # The deleted item's attributes no longer match anything
+    year = EQUIPMENT["e5"]["year"]
+    assert filtered_index.filtered_rows(parse_filters({"year": year})).size == 0
+
+
+def brute_force_equipment(corpus, live_rows, query, score, allowed=None):
+    """(equipment_id, similarity, image_count, best image id) for every equipment item, best first"""
+    groups = {}
+    for row in live_rows:
+        equipment_id = f"e{row % 10}"
+        if allowed is None or equipment_id in allowed:
+            groups.setdefault(equipment_id, []).append(row)
+    ranked = []
+    for equipment_id, rows in groups.items():
+        similarities = corpus[rows] @ query
+        if score == "max":
+            similarity = similarities.max()
+        elif score == "mean":
+            similarity = similarities.mean()
+        else:
+            centroid = corpus[rows].sum(axis=0)
+            similarity = centroid @ query / np.linalg.norm(centroid)
+        ranked.append((equipment_id, float(similarity), len(rows), f"i{rows[int(np.argmax(similarities))]}"))
+    return sorted(ranked, key=lambda item: -item[1])
+
+
+def assert_equipment_results(results, expected):
+    assert [result["equipment_id"] for result in results] == [item[0] for item in expected]
+    np.testing.assert_allclose([result["similarity"] for result in results], [item[1] for item in expected],
+                               rtol=1e-5, atol=1e-6)
+    assert [result["image_count"] for result in results] == [item[2] for item in expected]
+    assert [result["best_image"]["image_id"] for result in results] == [item[3] for item in expected]
+
+
+@pytest.mark.parametrize("score", ["max", "mean", "centroid"])
+@pytest.mark.parametrize("top_k", [1, 3, 10])
+def test_search_equipment_matches_brute_force(index, corpus, score, top_k):
+    query = normalized(np.random.default_rng(5).standard_normal(DIM).astype(np.float32))
+
+    results = index.search_equipment(query, top_k=top_k, score=score)
+
+    # top_k=10 needs every item, more than the first argpartition of the "max" score covers
+    assert_equipment_results(results, brute_force_equipment(corpus, range(len(corpus)), query, score)[:top_k])
+
+
+@pytest.mark.parametrize("score", ["max", "mean", "centroid"])
+def test_search_equipment_with_filters(filtered_index, corpus, score):
+    query = normalized(np.random.default_rng(6).standard_normal(DIM).astype(np.float32))
+    filters = parse_filters({"type": ["tank", "apc"], "inService": True})
+    allowed = {equipment_id for equipment_id, fields in EQUIPMENT.items()
+               if fields["type"].strip().lower() in ("tank", "apc") and fields["inService"]}
+
+    results = filtered_index.search_equipment(query, top_k=10, score=score, filters=filters)
+
+    assert_equipment_results(results, brute_force_equipment(corpus, range(len(corpus)), query, score, allowed))
+
+
+@pytest.mark.parametrize("score", ["max", "mean", "centroid"])
+def test_search_equipment_after_remove(index, corpus, score):
+    removed = set(range(0, len(corpus), 3)) | set(range(7, len(corpus), 10))  # all of e7 goes away
+    for row in removed:
+        index.remove(f"i{row}")
+    index.add("i1", corpus[1] * 2, "s1", "e1")  # re-adding keeps the sums right
+    query = normalized(np.random.default_rng(7).standard_normal(DIM).astype(np.float32))
+    live = [row for row in range(len(corpus)) if row not in removed]
+
+    results = index.search_equipment(query, top_k=10, score=score)
+
+    assert "e7" not in [result["equipment_id"] for result in results]
+    assert_equipment_results(results, brute_force_equipment(corpus, live, query, score))
+
+
+@pytest.mark.parametrize("score", ["mean", "centroid"])
+def test_search_equipment_recomputes_sums_after_load(index, corpus, tmp_path, score):
+    index.save(str(tmp_path / "snapshot"))
+    restored = VectorIndex(dim=DIM)
+    restored.load(str(tmp_path / "snapshot"))
+    assert restored._sums_stale
+    query = normalized(np.random.default_rng(8).standard_normal(DIM).astype(np.float32))
+
+    results = restored.search_equipment(query, top_k=5, score=score)
+
+    assert not restored._sums_stale
+    assert_equipment_results(results, brute_force_equipment(corpus, range(len(corpus)), query, score)[:5])
+
+
+def test_search_equipment_rejects_unknown_score(index, corpus):
+    with pytest.raises(ValueError):
+        index.search_equipment(corpus[0], score="median")
+
+
+def test_search_equipment_max_widens_past_one_dominant_item():
+    rng = np.random.default_rng(9)
+    query = normalized(rng.standard_normal(DIM).astype(np.float32))
+    # 100 images of "near" all score above every other item's images
+    near = normalized(query + 0.05 * rng.standard_normal((100, DIM)).astype(np.float32))
+    others = normalized(rng.standard_normal((20, DIM)).astype(np.float32))
+    index = VectorIndex(dim=DIM)
+    index.add_many([(f"near{row}", vector, "s", "near") for row, vector in enumerate(near)])
+    index.add_many([(f"other{row}", vector, "s", f"o{row % 5}") for row, vector in enumerate(others)])
+
+    results = index.search_equipment(query, top_k=3, score="max")
+
+    scores = others @ query
+    expected = sorted(((f"o{item}", scores[item::5].max()) for item in range(5)), key=lambda pair: -pair[1])[:2]
+    assert [result["equipment_id"] for result in results] == ["near"] + [equipment_id for equipment_id, _ in expected]
+    np.testing.assert_allclose([result["similarity"] for result in results[1:]], [score for _, score in expected],
+                               rtol=1e-5)
+    assert results[0]["image_count"] == 100
@@ -0,0 +1,66 @@
+"""
+Compact binary encoding for stored embeddings ("ImageEmbedding"."vectorDataBinary").
+
+Layout: one header byte with the encoding code, then the payload.
+    float32: little-endian float32 values
+    float16: little-endian float16 values
+    int8:    little-endian float32 scale, then int8 values (value = q * scale)
+
+Legacy rows only have "vectorDataJson"; `decode_stored` reads either form.
+"""
+import json
+import struct
+from typing import Optional
+
+import numpy as np
+
+FLOAT32 = "float32"
+FLOAT16 = "float16"
+INT8 = "int8"
+
+_CODES = {FLOAT32: 1, FLOAT16: 2, INT8: 3}
+_NAMES = {code: name for name, code in _CODES.items()}
+_SCALE = struct.Struct("<f")
+
+
+def encode_vector(vector, encoding: str = FLOAT32) -> bytes:
+    """Encodes a vector into the binary storage format"""
+    if encoding not in _CODES:
+        raise ValueError(f"Unknown vector encoding: {encoding}")
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    header = bytes([_CODES[encoding]])
+    if encoding == FLOAT32:
+        return header + vector.astype("<f4", copy=False).tobytes()
+    if encoding == FLOAT16:
+        return header + vector.astype("<f2").tobytes()
+    peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+    scale = peak / 127.0 if peak > 0 else 1.0
+    quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    return header + _SCALE.pack(scale) + quantized.tobytes()
+
+
+def decode_vector(blob: bytes) -> np.ndarray:
+    """Decodes a binary vector to float32 (zero-copy for float32 payloads)"""
+    encoding = _NAMES.get(blob[0]) if blob else None
+    if encoding == FLOAT32:
+        return np.frombuffer(blob, dtype="<f4", offset=1)
+    if encoding == FLOAT16:
+        return np.frombuffer(blob, dtype="<f2", offset=1).astype(np.float32)
+    if encoding == INT8:
+        (scale,) = _SCALE.unpack_from(blob, 1)
+        return np.frombuffer(blob, dtype=np.int8, offset=1 + _SCALE.size).astype(np.float32) * np.float32(scale)
+    raise ValueError(f"Unknown vector encoding code: {blob[0] if blob else None}")
+
+
+def vector_encoding(blob: bytes) -> Optional[str]:
+    """Name of the encoding used by a stored blob"""
+    return _NAMES.get(blob[0]) if blob else None
+
+
+def decode_stored(binary: Optional[bytes], json_text: Optional[str]) -> Optional[np.ndarray]:
+    """Reads a stored vector, preferring the binary column over legacy JSON text"""
+    if binary:
+        return decode_vector(binary)
+    if json_text:
+        return np.asarray(json.loads(json_text), dtype=np.float32)
+    return None
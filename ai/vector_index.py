@@ -0,0 +1,822 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+SNAPSHOT_VERSION = 2
+
+# Equipment attributes that search filters can match exactly (several values = any of them)
+CATEGORICAL_FILTERS = ("type", "country", "inService")
+# Characters trimmed from string filter values and attributes; the pgvector backend
+# passes the same set to btrim() so both search paths normalize identically
+FILTER_TRIM_CHARS = " \t\n\r\f\v"
+
+# How image similarities are combined into one score per equipment item in `search_equipment`
+GROUP_SCORES = ("max", "mean", "centroid")
+
+
+def _filter_key(value):
+    """Key under which an attribute value is indexed: strings match case-insensitively"""
+    if isinstance(value, str):
+        return value.strip(FILTER_TRIM_CHARS).lower()
+    return value
+
+
+def parse_filters(raw: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Validates search filters and returns them in normalized form (None if empty).
+
+    Accepted keys: "type" and "country" (a string or a list of strings),
+    "inService" (bool) and "year" (an int or {"min": int, "max": int}, both
+    bounds inclusive and optional). Raises ValueError on anything else.
+    """
+    if not raw:
+        return None
+    if not isinstance(raw, dict):
+        raise ValueError("filters must be an object")
+    unknown = set(raw) - set(CATEGORICAL_FILTERS) - {"year"}
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+    filters: Dict[str, Any] = {}
+    for field in ("type", "country"):
+        value = raw.get(field)
+        if value is None:
+            continue
+        values = [value] if isinstance(value, str) else value
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise ValueError(f"Filter {field} must be a string or a list of strings")
+        filters[field] = [_filter_key(v) for v in values]
+    if raw.get("inService") is not None:
+        if not isinstance(raw["inService"], bool):
+            raise ValueError("Filter inService must be a boolean")
+        filters["inService"] = [raw["inService"]]
+    year = raw.get("year")
+    if year is not None:
+        if isinstance(year, int) and not isinstance(year, bool):
+            year = {"min": year, "max": year}
+        if not isinstance(year, dict) or set(year) - {"min", "max"} or not all(
+                isinstance(v, int) and not isinstance(v, bool) for v in year.values() if v is not None):
+            raise ValueError('Filter year must be an int or {"min": int, "max": int}')
+        filters["year"] = (year.get("min"), year.get("max"))
+    return filters or None
+
+
+class VectorIndex:
+    """
+    Resident in-memory index of normalized CLIP vectors.
+
+    Vectors live in one contiguous float32 matrix; image ids, image sources and
+    equipment ids are kept in parallel lists with the same row order. Equipment
+    metadata is stored once per equipment item and joined into results lazily,
+    so updating e.g. imageUrl does not touch every row.
+
+    For filtered search every equipment item gets a small integer code and every
+    row stores its code. Each value of a categorical attribute (type, country,
+    inService) has a bitmap over equipment codes, and years are kept in one
+    array. A filter is resolved on the (small) equipment axis, then mapped to
+    rows, and only the matching rows are scored, so a filtered query costs less
+    than a global one.
+
+    The same codes index a running (float64) sum of each equipment item's
+    vectors and its image count, updated on every add, replace, remove and
+    clear. They give the mean similarity (sum . q / count) and the centroid
+    similarity (sum . q / |sum|) of all equipment items with one E x dim
+    product, see `search_equipment`. After `load` the sums are recomputed on
+    first use, so startup does not read every vector.
+
+    With a SegmentStore attached (`attach_store`) the vectors live on disk
+    instead of the matrix: every row keeps the number of its store row, writes
+    append to the store, and scans read it in chunks (see `StoreView`).
+    """
+
+    def __init__(self, dim: int = 512, initial_capacity: int = 1024):
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._vectors = np.empty((initial_capacity, dim), dtype=np.float32)
+        self._row_codes = np.empty(initial_capacity, dtype=np.int32)
+        self._store_rows = np.empty(initial_capacity, dtype=np.int64)
+        self._size = 0
+        self._ids: List[str] = []
+        self._sources: List[str] = []
+        self._equipment_ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._equipment: Dict[str, Dict[str, Any]] = {}
+        self._reset_attributes()
+        self.loaded = False
+        # Optional approximate backend (e.g. IVFFlatIndex), kept in sync on every write
+        self.ann = None
+        # Optional on-disk SegmentStore holding the vectors instead of self._vectors
+        self.store = None
+        self._sums_stale = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, image_id: str) -> bool:
+        return image_id in self._positions
+
+    def _ensure_capacity(self, extra: int):
+        required = self._size + extra
+        capacity = self._row_codes.shape[0]
+        if required <= capacity:
+            return
+        capacity = max(capacity, 1)
+        while capacity < required:
+            capacity *= 2
+        if self.store is None:
+            grown = np.empty((capacity, self.dim), dtype=np.float32)
+            grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+        else:
+            store_rows = np.empty(capacity, dtype=np.int64)
+            store_rows[:self._size] = self._store_rows[:self._size]
+            self._store_rows = store_rows
+        codes = np.empty(capacity, dtype=np.int32)
+        codes[:self._size] = self._row_codes[:self._size]
+        self._row_codes = codes
+
+    def _matrix(self, rows: Optional[np.ndarray] = None):
+        """Vectors of all rows (or of `rows`): an array, or a chunked StoreView when a store is attached"""
+        if self.store is None:
+            return self._vectors[:self._size] if rows is None else self._vectors[rows]
+        return self.store.view(self._store_rows[:self._size] if rows is None else self._store_rows[rows])
+
+    def _take(self, rows) -> np.ndarray:
+        """float32 vectors of `rows` as an array"""
+        if self.store is None:
+            return self._vectors[rows]
+        return self.store.take(self._store_rows[rows])
+
+    def _reset_attributes(self):
+        self._equipment_codes: Dict[str, int] = {}
+        self._equipment_order: List[Optional[str]] = []
+        self._free_codes: List[int] = []
+        self._deleted_equipment: Set[str] = set()
+        self._bitmaps: Dict[str, Dict[Any, np.ndarray]] = {field: {} for field in CATEGORICAL_FILTERS}
+        self._years = np.full(64, np.nan, dtype=np.float32)
+        self._vector_sums = np.zeros((64, self.dim), dtype=np.float64)
+        self._vector_counts = np.zeros(64, dtype=np.int64)
+
+    def _equipment_code(self, equipment_id: str) -> int:
+        """Code of an equipment item, registering it (and growing the attribute arrays) if new"""
+        code = self._equipment_codes.get(equipment_id)
+        if code is not None:
+            return code
+        if self._free_codes:
+            code = self._free_codes.pop()
+            self._equipment_order[code] = equipment_id
+        else:
+            code = len(self._equipment_order)
+            self._equipment_order.append(equipment_id)
+        self._equipment_codes[equipment_id] = code
+        self._deleted_equipment.discard(equipment_id)
+        capacity = self._years.shape[0]
+        if code >= capacity:
+            years = np.full(capacity * 2, np.nan, dtype=np.float32)
+            years[:capacity] = self._years
+            self._years = years
+            self._vector_sums = np.concatenate([self._vector_sums, np.zeros((capacity, self.dim))])
+            self._vector_counts = np.concatenate([self._vector_counts, np.zeros(capacity, dtype=np.int64)])
+            for bitmaps in self._bitmaps.values():
+                for key, bitmap in bitmaps.items():
+                    bitmaps[key] = np.concatenate([bitmap, np.zeros(capacity, dtype=bool)])
+        equipment = self._equipment.setdefault(equipment_id, {"id": equipment_id})
+        self._index_attributes(code, {}, equipment)
+        return code
+
+    def _index_attributes(self, code: int, old: Dict[str, Any], new: Dict[str, Any]):
+        for field in CATEGORICAL_FILTERS:
+            old_key, new_key = _filter_key(old.get(field)), _filter_key(new.get(field))
+            if old_key == new_key:
+                continue
+            bitmaps = self._bitmaps[field]
+            if old_key is not None and old_key in bitmaps:
+                bitmaps[old_key][code] = False
+            if new_key is not None:
+                if new_key not in bitmaps:
+                    bitmaps[new_key] = np.zeros(self._years.shape[0], dtype=bool)
+                bitmaps[new_key][code] = True
+        year = new.get("year")
+        self._years[code] = year if year is not None else np.nan
+
+    def _drop_equipment(self, equipment_id: str):
+        """Forgets an equipment item no row references; its code is reused by the next new item"""
+        code = self._equipment_codes.pop(equipment_id)
+        self._index_attributes(code, self._equipment.pop(equipment_id, {}), {})
+        self._vector_sums[code] = 0
+        self._equipment_order[code] = None
+        self._free_codes.append(code)
+        self._deleted_equipment.discard(equipment_id)
+
+    def _release_code(self, code: int):
+        """Called when a row stops referencing `code`: drops deleted equipment once unreferenced"""
+        self._vector_counts[code] -= 1
+        equipment_id = self._equipment_order[code]
+        if self._vector_counts[code] == 0 and equipment_id in self._deleted_equipment:
+            self._drop_equipment(equipment_id)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def set_equipment(self, equipment_id: str, **fields):
+        """Creates or updates metadata for an equipment item"""
+        with self._lock:
+            code = self._equipment_code(equipment_id)
+            equipment = self._equipment[equipment_id]
+            old = dict(equipment)
+            equipment.update(fields)
+            self._index_attributes(code, old, equipment)
+
+    def remove_equipment(self, equipment_id: str) -> bool:
+        """
+        Drops the metadata (attributes, filter bitmaps) of a deleted equipment item.
+
+        Rows still referencing the item keep it until the last of them is removed
+        or moved to other equipment. Returns True if it was dropped right away.
+        """
+        with self._lock:
+            code = self._equipment_codes.get(equipment_id)
+            if code is None:
+                self._equipment.pop(equipment_id, None)
+                return True
+            if self._vector_counts[code] > 0:
+                self._deleted_equipment.add(equipment_id)
+                return False
+            self._drop_equipment(equipment_id)
+            return True
+
+    def add(self, image_id: str, vector: np.ndarray, image_source: str, equipment_id: str):
+        """Adds (or replaces) a single embedding"""
+        self.add_many([(image_id, vector, image_source, equipment_id)])
+
+    def add_many(self, items: Iterable[Tuple[str, np.ndarray, str, str]]):
+        """Adds a batch of (image_id, vector, image_source, equipment_id) tuples"""
+        items = list(items)
+        if not items:
+            return
+        vectors = np.asarray([item[1] for item in items], dtype=np.float32).reshape(len(items), self.dim)
+        vectors = self._normalize(vectors)
+        with self._lock:
+            self._ensure_capacity(len(items))
+            store_rows = self.store.append([item[0] for item in items], vectors) if self.store is not None else None
+            for index, ((image_id, _, image_source, equipment_id), vector) in enumerate(zip(items, vectors)):
+                position = self._positions.get(image_id)
+                code = self._equipment_code(equipment_id)
+                previous = None
+                if position is None:
+                    position = self._size
+                    self._size += 1
+                    self._ids.append(image_id)
+                    self._sources.append(image_source)
+                    self._equipment_ids.append(equipment_id)
+                    self._positions[image_id] = position
+                else:
+                    self._sources[position] = image_source
+                    self._equipment_ids[position] = equipment_id
+                    previous = self._row_codes[position]
+                    if not self._sums_stale:
+                        self._vector_sums[previous] -= self._take([position])[0]
+                if store_rows is None:
+                    self._vectors[position] = vector
+                else:
+                    self._store_rows[position] = store_rows[index]
+                self._row_codes[position] = code
+                if not self._sums_stale:
+                    self._vector_sums[code] += vector
+                self._vector_counts[code] += 1
+                if previous is not None:
+                    self._release_code(previous)
+            if self.ann is not None:
+                self.ann.add_many([item[0] for item in items], vectors)
+
+    def add_stored(self, items: Iterable[Tuple[str, str, str]]) -> List[str]:
+        """
+        Indexes (image_id, image_source, equipment_id) rows whose vectors the attached
+        store already holds, without reading or writing them, and returns the ids the
+        store does not hold. As after `load`, the sums are recomputed on first use.
+        """
+        if self.store is None:
+            raise ValueError("add_stored needs an attached vector store")
+        items = list(items)
+        with self._lock:
+            store_rows = [self.store.row(item[0]) for item in items]
+            found = [(item, row) for item, row in zip(items, store_rows) if row is not None]
+            self._ensure_capacity(len(found))
+            for (image_id, image_source, equipment_id), store_row in found:
+                position = self._positions.get(image_id)
+                code = self._equipment_code(equipment_id)
+                previous = None
+                if position is None:
+                    position = self._size
+                    self._size += 1
+                    self._ids.append(image_id)
+                    self._sources.append(image_source)
+                    self._equipment_ids.append(equipment_id)
+                    self._positions[image_id] = position
+                else:
+                    self._sources[position] = image_source
+                    self._equipment_ids[position] = equipment_id
+                    previous = self._row_codes[position]
+                self._store_rows[position] = store_row
+                self._row_codes[position] = code
+                self._vector_counts[code] += 1
+                if previous is not None:
+                    self._release_code(previous)
+            if found:
+                self._sums_stale = True
+                if self.ann is not None:
+                    self.ann.add_many([item[0] for item, _ in found],
+                                      self.store.take(np.array([row for _, row in found], dtype=np.int64)))
+        return [item[0] for item, row in zip(items, store_rows) if row is None]
+
+    def prune_store(self) -> int:
+        """Deletes the store rows of ids the index does not hold; returns how many were deleted"""
+        with self._lock:
+            return self.store.delete([image_id for image_id in self.store.ids() if image_id not in self._positions])
+
+    def remove(self, image_id: str) -> bool:
+        """Removes an embedding by moving the last row into its slot"""
+        with self._lock:
+            position = self._positions.pop(image_id, None)
+            if position is None:
+                return False
+            if self.ann is not None:
+                self.ann.remove(image_id)
+            code = self._row_codes[position]
+            if not self._sums_stale:
+                self._vector_sums[code] -= self._take([position])[0]
+            self._release_code(code)
+            if self.store is not None:
+                self.store.delete([image_id])
+            last = self._size - 1
+            if position != last:
+                if self.store is None:
+                    self._vectors[position] = self._vectors[last]
+                else:
+                    self._store_rows[position] = self._store_rows[last]
+                self._row_codes[position] = self._row_codes[last]
+                self._ids[position] = self._ids[last]
+                self._sources[position] = self._sources[last]
+                self._equipment_ids[position] = self._equipment_ids[last]
+                self._positions[self._ids[position]] = position
+            self._ids.pop()
+            self._sources.pop()
+            self._equipment_ids.pop()
+            self._size = last
+            return True
+
+    def clear(self, keep_store: bool = False):
+        """
+        Drops all embeddings (equipment metadata is kept). With `keep_store` the
+        store rows stay on disk, to be indexed again with `add_stored`.
+        """
+        with self._lock:
+            self._size = 0
+            self._ids.clear()
+            self._sources.clear()
+            self._equipment_ids.clear()
+            self._positions.clear()
+            self._vector_sums[:] = 0
+            self._vector_counts[:] = 0
+            self._sums_stale = False
+            for equipment_id in list(self._deleted_equipment):
+                self._drop_equipment(equipment_id)
+            if self.store is not None and not keep_store:
+                self.store.clear()
+            if self.ann is not None:
+                self.ann.clear()
+
+    def attach_store(self, store):
+        """
+        Moves vector storage to a SegmentStore (opened here if needed). Rows
+        already in the index are appended to it; rows the store already holds
+        are kept for `load`, which reuses them instead of reading a matrix.
+        """
+        with self._lock:
+            if not store.is_open:
+                store.open()
+            vectors = self._vectors[:self._size]
+            self.store = store
+            self._store_rows = np.empty(self._row_codes.shape[0], dtype=np.int64)
+            if self._size:
+                self._store_rows[:self._size] = store.append(self._ids, vectors)
+            self._vectors = np.empty((0, self.dim), dtype=np.float32)
+
+    def compact(self) -> bool:
+        """
+        Rewrites the store without its deleted rows. The copy runs outside the
+        lock (store rows are immutable), only the switch to the new generation
+        and the row renumbering block searches. Returns whether it compacted.
+        """
+        with self._lock:
+            plan = self.store.begin_compaction() if self.store is not None else None
+        if plan is None:
+            return False
+        try:
+            self.store.run_compaction(plan)
+        except Exception:
+            with self._lock:
+                self.store.abort_compaction(plan)
+            raise
+        with self._lock:
+            mapping = self.store.finish_compaction(plan)
+            if mapping is None:
+                return False
+            self._store_rows[:self._size] = mapping[self._store_rows[:self._size]]
+        return True
+
+    @property
+    def equipment_with_embeddings(self) -> int:
+        return int(np.count_nonzero(self._vector_counts))
+
+    def stats(self) -> Dict[str, Any]:
+        """Sizes and memory footprint from the structures themselves (no scans, no DB)"""
+        with self._lock:
+            attribute_bytes = (self._row_codes.nbytes + self._years.nbytes + self._vector_sums.nbytes
+                               + self._vector_counts.nbytes
+                               + sum(bitmap.nbytes for bitmaps in self._bitmaps.values() for bitmap in bitmaps.values()))
+            if self.store is not None:
+                store = self.store.stats()
+                return {
+                    "size": self._size,
+                    "dim": self.dim,
+                    "capacity": self._row_codes.shape[0],
+                    "equipment": len(self._equipment),
+                    "equipment_with_embeddings": self.equipment_with_embeddings,
+                    "memory_mapped": True,
+                    "vector_bytes": store["disk_bytes"],
+                    "vector_bytes_used": store["live_rows"] * self.dim * np.dtype(self.store.dtype).itemsize,
+                    "attribute_bytes": attribute_bytes + self._store_rows.nbytes,
+                    "store": store,
+                    "ann": self.ann.stats() if self.ann is not None else None
+                }
+            return {
+                "size": self._size,
+                "dim": self.dim,
+                "capacity": self._vectors.shape[0],
+                "equipment": len(self._equipment),
+                "equipment_with_embeddings": self.equipment_with_embeddings,
+                "memory_mapped": isinstance(self._vectors, np.memmap),
+                "vector_bytes": self._vectors.nbytes,
+                "vector_bytes_used": self._size * self.dim * self._vectors.itemsize,
+                "attribute_bytes": attribute_bytes,
+                "ann": self.ann.stats() if self.ann is not None else None
+            }
+
+    def snapshot(self) -> Tuple[List[str], np.ndarray]:
+        """Copies of the current ids and vector matrix (row-aligned)"""
+        with self._lock:
+            return list(self._ids), np.array(self._matrix()[0:self._size])
+
+    def save(self, path: str, **info):
+        """
+        Writes a snapshot: `<path>.npy` holds the vector matrix, `<path>.json` the
+        row metadata, equipment metadata and any extra `info` (e.g. a DB watermark).
+        With a store the vectors are already on disk and only the JSON is written.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            meta = {
+                "version": SNAPSHOT_VERSION,
+                "dim": self.dim,
+                "ids": list(self._ids),
+                "sources": list(self._sources),
+                "equipment_ids": list(self._equipment_ids),
+                "equipment": {key: dict(value) for key, value in self._equipment.items()},
+                "store": self.store is not None,
+                "info": info
+            }
+            if self.store is not None:
+                self.store.flush()
+            else:
+                with open(f"{path}.npy.tmp", "wb") as f:
+                    np.save(f, self._vectors[:self._size])
+        with open(f"{path}.json.tmp", "w") as f:
+            json.dump(meta, f)
+        if self.store is None:
+            os.replace(f"{path}.npy.tmp", f"{path}.npy")
+        os.replace(f"{path}.json.tmp", f"{path}.json")
+
+    def load(self, path: str, mmap: bool = True) -> Dict[str, Any]:
+        """
+        Replaces the contents with a snapshot written by `save` and returns its `info`.
+
+        With `mmap` the matrix is mapped copy-on-write instead of read into memory:
+        processes loading the same snapshot share its pages, and later writes only
+        copy the pages they touch (growing past the snapshot size moves it to RAM).
+        With a store the rows are looked up in it by id; store rows the snapshot
+        does not list are deleted.
+        """
+        with open(f"{path}.json") as f:
+            meta = json.load(f)
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot {path} has format version {meta.get('version')}, expected {SNAPSHOT_VERSION}")
+        if meta.get("store", False) != (self.store is not None):
+            raise ValueError(f"Snapshot {path} was saved {'with' if meta.get('store') else 'without'} a vector store")
+        if self.store is not None:
+            vectors = None
+            store_rows = np.fromiter((-1 if row is None else row for row in map(self.store.row, meta["ids"])),
+                                     dtype=np.int64, count=len(meta["ids"]))
+            if meta["dim"] != self.dim or (store_rows < 0).any():
+                raise ValueError(f"Snapshot {path} does not match the vector store: "
+                                 f"{int((store_rows < 0).sum())} of {len(meta['ids'])} ids missing, "
+                                 f"dim {meta['dim']} (expected {self.dim})")
+        else:
+            vectors = np.load(f"{path}.npy", mmap_mode="c" if mmap else None)
+            if meta["dim"] != self.dim or vectors.shape != (len(meta["ids"]), self.dim):
+                raise ValueError(f"Snapshot {path} does not match the index: matrix {vectors.shape}, "
+                                 f"{len(meta['ids'])} ids, dim {meta['dim']} (expected {self.dim})")
+        with self._lock:
+            if self.store is not None:
+                self._store_rows = store_rows
+            else:
+                self._vectors = vectors
+            self._size = len(meta["ids"])
+            self._ids = meta["ids"]
+            self._sources = meta["sources"]
+            self._equipment_ids = meta["equipment_ids"]
+            self._positions = {image_id: position for position, image_id in enumerate(self._ids)}
+            if self.store is not None:
+                self.prune_store()
+            self._equipment = meta["equipment"]
+            self._reset_attributes()
+            self._row_codes = np.fromiter((self._equipment_code(equipment_id) for equipment_id in self._equipment_ids),
+                                          dtype=np.int32, count=self._size)
+            for equipment_id in self._equipment:
+                self._equipment_code(equipment_id)
+            self._vector_counts[:] = np.bincount(self._row_codes[:self._size], minlength=self._vector_counts.shape[0])
+            self._sums_stale = True
+            if self.ann is not None:
+                self.attach_ann(self.ann)
+        return meta.get("info", {})
+
+    def _accumulate_vectors(self, block_rows: int = 65536):
+        """Recomputes the per-equipment vector sums from all rows (one sequential scan)"""
+        self._vector_sums[:] = 0
+        matrix = self._matrix()
+        for start in range(0, self._size, block_rows):
+            codes = self._row_codes[start:min(start + block_rows, self._size)]
+            order = np.argsort(codes, kind="stable")
+            codes = codes[order]
+            starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+            self._vector_sums[codes[starts]] += np.add.reduceat(
+                matrix[start:start + block_rows][order].astype(np.float64), starts)
+        self._sums_stale = False
+
+    def attach_ann(self, ann):
+        """Attaches an approximate backend and reconciles it with the current contents"""
+        with self._lock:
+            known = set(ann.ids())
+            for image_id in known - self._positions.keys():
+                ann.remove(image_id)
+            missing = [image_id for image_id in self._ids if image_id not in known]
+            if missing:
+                ann.add_many(missing, self._take([self._positions[i] for i in missing]))
+            self.ann = ann
+
+    def _equipment_metadata(self, equipment_id: str) -> Dict[str, Any]:
+        equipment = self._equipment.get(equipment_id, {})
+        return {
+            "id": equipment_id,
+            "name": equipment.get("name"),
+            "type": equipment.get("type"),
+            "imageUrl": equipment.get("imageUrl"),
+            "country": equipment.get("country"),
+            "inService": equipment.get("inService"),
+            "year": equipment.get("year")
+        }
+
+    def _result(self, position: int, similarity: float) -> Dict[str, Any]:
+        return {
+            "image_id": self._ids[position],
+            "similarity": similarity,
+            "metadata": {
+                "militaryEquipment": self._equipment_metadata(self._equipment_ids[position]),
+                "imageSource": self._sources[position]
+            }
+        }
+
+    def _equipment_result(self, code: int, similarity: float, best_position: int,
+                          best_similarity: float) -> Dict[str, Any]:
+        equipment_id = self._equipment_order[code]
+        return {
+            "equipment_id": equipment_id,
+            "similarity": similarity,
+            "image_count": int(self._vector_counts[code]),
+            "best_image": {
+                "image_id": self._ids[best_position],
+                "similarity": best_similarity,
+                "imageSource": self._sources[best_position]
+            },
+            "metadata": {"militaryEquipment": self._equipment_metadata(equipment_id)}
+        }
+
+    def _equipment_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Boolean mask over equipment codes matching all filters (parsed by `parse_filters`)"""
+        count = len(self._equipment_order)
+        mask = np.ones(count, dtype=bool)
+        for field in CATEGORICAL_FILTERS:
+            values = filters.get(field)
+            if values is None:
+                continue
+            matched = np.zeros(count, dtype=bool)
+            for value in values:
+                bitmap = self._bitmaps[field].get(value)
+                if bitmap is not None:
+                    matched |= bitmap[:count]
+            mask &= matched
+        if filters.get("year") is not None:
+            low, high = filters["year"]
+            years = self._years[:count]
+            if low is not None:
+                mask &= years >= low
+            if high is not None:
+                mask &= years <= high
+        return mask
+
+    def filtered_rows(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Row positions whose equipment matches the filters"""
+        with self._lock:
+            mask = self._equipment_mask(filters)
+            if not mask.any():
+                return np.empty(0, dtype=np.int64)
+            return np.flatnonzero(mask[self._row_codes[:self._size]])
+
+    def rank(self, query_vector: np.ndarray, top_k: int = 5, nprobe: Optional[int] = None, exact: bool = False,
+             filters: Optional[Dict[str, Any]] = None) -> Tuple[List[str], np.ndarray]:
+        """
+        Ids and scores of the top_k most similar embeddings, best first.
+
+        Only the top_k scores are selected (argpartition) and sorted, and no
+        result dicts are built, so a ranking can be kept and materialized page
+        by page with `results`. Uses the attached ANN backend unless `exact` is
+        set or the backend is untrained. With `filters` (see `parse_filters`)
+        only the matching rows are scored, always exactly, so the ranking is the
+        true top_k of the filtered set.
+        """
+        query = np.asarray(query_vector, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            if self._size == 0 or top_k <= 0:
+                return [], np.empty(0, dtype=np.float32)
+            if filters:
+                rows = self.filtered_rows(filters)
+                scores = self._matrix(rows) @ query
+                top = top_k_indices(scores, top_k)
+                return [self._ids[rows[i]] for i in top], scores[top]
+            if not exact and self.ann is not None and self.ann.is_trained:
+                ids, scores = self.ann.search(query, top_k, nprobe)
+                return list(ids), np.asarray(scores, dtype=np.float32)
+            scores = self._matrix() @ query
+            top = top_k_indices(scores, top_k)
+            return [self._ids[i] for i in top], scores[top]
+
+    def results(self, ids: Sequence[str], scores: Sequence[float]) -> List[Dict[str, Any]]:
+        """Result dicts for ranked ids; ids removed from the index since ranking are skipped"""
+        with self._lock:
+            return [self._result(self._positions[image_id], float(score))
+                    for image_id, score in zip(ids, scores) if image_id in self._positions]
+
+    def search(self, query_vector: np.ndarray, top_k: int = 5, nprobe: Optional[int] = None,
+               exact: bool = False, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Returns top_k most similar embeddings as result dicts, best first (see `rank`)"""
+        return self.results(*self.rank(query_vector, top_k, nprobe, exact, filters))
+
+    def search_equipment(self, query_vector: np.ndarray, top_k: int = 5, score: str = "max",
+                         filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the top_k equipment items (each listed once), best first.
+
+        `score` combines the similarities of an item's images: "max" (best image),
+        "mean" (average image similarity) or "centroid" (similarity to the
+        normalized mean vector). "mean" and "centroid" score the per-equipment
+        vector sums, so they cost E x dim instead of N x dim. "max" scores the
+        rows and widens an argpartition until it covers top_k distinct items.
+        Every result carries its best matching image. Scoring is always exact.
+        """
+        if score not in GROUP_SCORES:
+            raise ValueError(f"Unknown group score {score!r}, expected one of {GROUP_SCORES}")
+        query = np.asarray(query_vector, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            if self._size == 0 or top_k <= 0:
+                return []
+            count = len(self._equipment_order)
+            mask = self._vector_counts[:count] > 0
+            if filters:
+                mask &= self._equipment_mask(filters)
+            wanted = min(top_k, int(mask.sum()))
+            if wanted == 0:
+                return []
+
+            if score == "max":
+                rows = np.flatnonzero(mask[self._row_codes[:self._size]]) if filters else None
+                scores = self._matrix(rows) @ query
+                codes = self._row_codes[:self._size] if rows is None else self._row_codes[rows]
+                candidates = wanted * 4
+                while True:
+                    top = top_k_indices(scores, candidates)
+                    _, first = np.unique(codes[top], return_index=True)
+                    if len(first) >= wanted or candidates >= len(scores):
+                        break
+                    candidates *= 4
+                best = top[np.sort(first)][:wanted]
+                return [self._equipment_result(int(codes[i]), float(scores[i]),
+                                               int(i if rows is None else rows[i]), float(scores[i])) for i in best]
+
+            if self._sums_stale:
+                self._accumulate_vectors()
+            sums = self._vector_sums[:count]
+            dots = sums @ query.astype(np.float64)
+            if score == "mean":
+                equipment_scores = dots / np.maximum(self._vector_counts[:count], 1)
+            else:
+                equipment_scores = dots / np.maximum(np.linalg.norm(sums, axis=1), 1e-12)
+            equipment_scores[~mask] = -np.inf
+            chosen = top_k_indices(equipment_scores, wanted)
+            # Best image only for the chosen equipment items
+            rows = np.flatnonzero(np.isin(self._row_codes[:self._size], chosen))
+            row_scores = self._matrix(rows) @ query
+            order = np.argsort(-row_scores, kind="stable")
+            best_codes, first = np.unique(self._row_codes[rows[order]], return_index=True)
+            best = {int(code): int(order[i]) for code, i in zip(best_codes, first)}
+            return [self._equipment_result(int(code), float(equipment_scores[code]), int(rows[best[int(code)]]),
+                                           float(row_scores[best[int(code)]])) for code in chosen]
+
+    def search_batch(self, queries: np.ndarray, top_k: int = 5, nprobe: Optional[int] = None, exact: bool = False,
+                     filters: Optional[List[Optional[Dict[str, Any]]]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Top_k results for each row of `queries` (Q x dim), in query order.
+
+        Queries with the same filters are scored together with one Q x N matrix
+        product over the (filtered) rows. Unfiltered queries go through the ANN
+        backend one by one when it is used (see `search`).
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        filters = filters or [None] * len(queries)
+        results: List[List[Dict[str, Any]]] = [[] for _ in range(len(queries))]
+        with self._lock:
+            if self._size == 0 or top_k <= 0:
+                return results
+            groups: Dict[str, List[int]] = {}
+            for position, query_filters in enumerate(filters):
+                groups.setdefault(json.dumps(query_filters, sort_keys=True), []).append(position)
+            for positions in groups.values():
+                query_filters = filters[positions[0]]
+                if not query_filters and not exact and self.ann is not None and self.ann.is_trained:
+                    for position in positions:
+                        results[position] = self.search(queries[position], top_k, nprobe=nprobe)
+                    continue
+                rows = self.filtered_rows(query_filters) if query_filters else None
+                matrix = self._matrix(rows)
+                if matrix.shape[0] == 0:
+                    continue
+                top_rows, top_scores = top_k_batch(queries[positions], matrix, top_k)
+                if rows is not None:
+                    top_rows = rows[top_rows]
+                for position, row_ids, scores in zip(positions, top_rows, top_scores):
+                    results[position] = [self._result(int(i), float(score)) for i, score in zip(row_ids, scores)]
+        return results
+
+
+def top_k_batch(queries: np.ndarray, matrix: np.ndarray, top_k: int,
+                block_rows: int = 32768) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row indices and scores of the top_k rows of `matrix` for every query, best first.
+
+    Scores `queries @ matrix.T` in blocks of `block_rows` corpus rows and keeps a
+    running top_k per query, so memory stays at Q x block_rows scores.
+    """
+    count = queries.shape[0]
+    top_k = min(top_k, matrix.shape[0])
+    best_rows = np.empty((count, 0), dtype=np.int64)
+    best_scores = np.empty((count, 0), dtype=np.float32)
+    for start in range(0, matrix.shape[0], block_rows):
+        scores = queries @ matrix[start:start + block_rows].T
+        if scores.shape[1] > top_k:
+            rows = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+            scores = np.take_along_axis(scores, rows, axis=1)
+        else:
+            rows = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        best_rows = np.concatenate([best_rows, rows + start], axis=1)
+        best_scores = np.concatenate([best_scores, scores], axis=1)
+        if best_scores.shape[1] > top_k:
+            keep = np.argpartition(-best_scores, top_k - 1, axis=1)[:, :top_k]
+            best_rows = np.take_along_axis(best_rows, keep, axis=1)
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, sorted descending"""
+    if top_k >= scores.shape[0]:
+        return np.argsort(-scores, kind="stable")
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
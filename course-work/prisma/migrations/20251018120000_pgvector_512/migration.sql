@@ -0,0 +1,12 @@
+/*
+  Warnings:
+
+  - The `vectorData` column on the `ImageEmbedding` table is recreated as vector(512) (CLIP ViT-B/32). Existing values are dropped; run `python ai/backfill_pgvector.py` to refill it from `vectorDataJson`.
+
+*/
+-- AlterTable
+ALTER TABLE "ImageEmbedding" DROP COLUMN "vectorData",
+ADD COLUMN     "vectorData" vector(512);
+
+-- CreateIndex
+CREATE INDEX "ImageEmbedding_vectorData_idx" ON "ImageEmbedding" USING hnsw ("vectorData" vector_cosine_ops);
@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "ImageEmbedding" ADD COLUMN     "vectorDataBinary" BYTEA;
@@ -0,0 +1,5 @@
+-- AlterTable
+ALTER TABLE "ImageEmbedding" ADD COLUMN     "contentHash" TEXT;
+
+-- CreateIndex
+CREATE INDEX "ImageEmbedding_contentHash_idx" ON "ImageEmbedding"("contentHash");
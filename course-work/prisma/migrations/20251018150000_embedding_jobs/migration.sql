@@ -0,0 +1,37 @@
+-- CreateTable
+CREATE TABLE "EmbeddingJob" (
+    "id" TEXT NOT NULL,
+    "status" TEXT NOT NULL DEFAULT 'queued',
+    "total" INTEGER NOT NULL,
+    "processed" INTEGER NOT NULL DEFAULT 0,
+    "succeeded" INTEGER NOT NULL DEFAULT 0,
+    "failed" INTEGER NOT NULL DEFAULT 0,
+    "options" JSONB,
+    "error" TEXT,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updatedAt" TIMESTAMP(3) NOT NULL,
+    "startedAt" TIMESTAMP(3),
+    "finishedAt" TIMESTAMP(3),
+
+    CONSTRAINT "EmbeddingJob_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateTable
+CREATE TABLE "EmbeddingJobItem" (
+    "jobId" TEXT NOT NULL,
+    "position" INTEGER NOT NULL,
+    "payload" JSONB NOT NULL,
+    "status" TEXT NOT NULL DEFAULT 'pending',
+    "result" JSONB,
+
+    CONSTRAINT "EmbeddingJobItem_pkey" PRIMARY KEY ("jobId","position")
+);
+
+-- CreateIndex
+CREATE INDEX "EmbeddingJob_status_idx" ON "EmbeddingJob"("status");
+
+-- CreateIndex
+CREATE INDEX "EmbeddingJobItem_jobId_status_idx" ON "EmbeddingJobItem"("jobId", "status");
+
+-- AddForeignKey
+ALTER TABLE "EmbeddingJobItem" ADD CONSTRAINT "EmbeddingJobItem_jobId_fkey" FOREIGN KEY ("jobId") REFERENCES "EmbeddingJob"("id") ON DELETE CASCADE ON UPDATE CASCADE;
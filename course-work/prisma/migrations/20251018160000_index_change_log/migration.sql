@@ -0,0 +1,56 @@
+-- CreateTable
+CREATE TABLE "IndexChange" (
+    "id" BIGSERIAL NOT NULL,
+    "tableName" TEXT NOT NULL,
+    "operation" TEXT NOT NULL,
+    "rowId" TEXT NOT NULL,
+    "createdAt" TIMESTAMPTZ(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "IndexChange_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "IndexChange_createdAt_idx" ON "IndexChange"("createdAt");
+
+-- Change feed for the AI service's in-memory index: every write that affects search
+-- (from Prisma or from the AI service itself) is logged here and announced on a channel
+CREATE OR REPLACE FUNCTION record_index_change() RETURNS trigger AS $$
+DECLARE
+    change_id BIGINT;
+BEGIN
+    INSERT INTO "IndexChange" ("tableName", "operation", "rowId")
+    VALUES (TG_TABLE_NAME, TG_OP, CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END)
+    RETURNING id INTO change_id;
+    PERFORM pg_notify('ai_index_changes', change_id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- CreateTrigger
+CREATE TRIGGER "ImageEmbedding_index_change_write"
+AFTER INSERT OR DELETE ON "ImageEmbedding"
+FOR EACH ROW EXECUTE FUNCTION record_index_change();
+
+CREATE TRIGGER "ImageEmbedding_index_change_update"
+AFTER UPDATE ON "ImageEmbedding"
+FOR EACH ROW
+WHEN (OLD."imageSource" IS DISTINCT FROM NEW."imageSource"
+   OR OLD."militaryEquipmentId" IS DISTINCT FROM NEW."militaryEquipmentId"
+   OR OLD."vectorDataBinary" IS DISTINCT FROM NEW."vectorDataBinary"
+   OR OLD."vectorDataJson" IS DISTINCT FROM NEW."vectorDataJson")
+EXECUTE FUNCTION record_index_change();
+
+CREATE TRIGGER "MilitaryEquipment_index_change_write"
+AFTER INSERT OR DELETE ON "MilitaryEquipment"
+FOR EACH ROW EXECUTE FUNCTION record_index_change();
+
+CREATE TRIGGER "MilitaryEquipment_index_change_update"
+AFTER UPDATE ON "MilitaryEquipment"
+FOR EACH ROW
+WHEN (OLD."name" IS DISTINCT FROM NEW."name"
+   OR OLD."type" IS DISTINCT FROM NEW."type"
+   OR OLD."country" IS DISTINCT FROM NEW."country"
+   OR OLD."imageUrl" IS DISTINCT FROM NEW."imageUrl"
+   OR OLD."inService" IS DISTINCT FROM NEW."inService"
+   OR OLD."year" IS DISTINCT FROM NEW."year")
+EXECUTE FUNCTION record_index_change();
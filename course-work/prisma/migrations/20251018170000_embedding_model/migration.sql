@@ -0,0 +1,20 @@
+-- AlterTable
+ALTER TABLE "ImageEmbedding" ADD COLUMN     "modelId" TEXT NOT NULL DEFAULT 'ViT-B/32',
+ADD COLUMN     "dimension" INTEGER NOT NULL DEFAULT 512;
+
+-- CreateIndex
+CREATE INDEX "ImageEmbedding_modelId_idx" ON "ImageEmbedding"("modelId");
+
+-- Moving a row to another model moves its vector to another index, so the change log must see it
+DROP TRIGGER "ImageEmbedding_index_change_update" ON "ImageEmbedding";
+
+CREATE TRIGGER "ImageEmbedding_index_change_update"
+AFTER UPDATE ON "ImageEmbedding"
+FOR EACH ROW
+WHEN (OLD."imageSource" IS DISTINCT FROM NEW."imageSource"
+   OR OLD."militaryEquipmentId" IS DISTINCT FROM NEW."militaryEquipmentId"
+   OR OLD."vectorDataBinary" IS DISTINCT FROM NEW."vectorDataBinary"
+   OR OLD."vectorDataJson" IS DISTINCT FROM NEW."vectorDataJson"
+   OR OLD."modelId" IS DISTINCT FROM NEW."modelId"
+   OR OLD."dimension" IS DISTINCT FROM NEW."dimension")
+EXECUTE FUNCTION record_index_change();
@@ -6,9 +6,10 @@ import {
   UseInterceptors,
   UploadedFile,
   Query,
+  Param,
   BadRequestException,
 } from '@nestjs/common';
-import { AiService } from './ai.service';
+import { AiService, SearchFilters, SearchGrouping } from './ai.service';
 import { FileInterceptor } from '@nestjs/platform-express';
 import { FileService } from '../fileHandling/file.service';
 
@@ -76,7 +77,7 @@ export class AiController {
 
   @Post('embed')
   async createEmbedding(
-    @Body() data: { image_source: string; metadata?: any },
+    @Body() data: { image_source: string; metadata?: any; model?: string },
   ) {
     try {
       if (!data.image_source) {
@@ -109,6 +110,7 @@ export class AiController {
         metadata?: any;
         image_id?: string;
       }>;
+      model?: string;
     },
   ) {
     if (
@@ -130,11 +132,80 @@ export class AiController {
     return this.aiService.bulkEmbed(data);
   }
 
+  @Post('bulk-embed/jobs')
+  async submitBulkEmbedJob(
+    @Body()
+    data: {
+      images: Array<{
+        image_source: string;
+        metadata?: any;
+        image_id?: string;
+      }>;
+      skip_duplicates?: boolean;
+      model?: string;
+    },
+  ) {
+    if (
+      !data.images ||
+      !Array.isArray(data.images) ||
+      data.images.length === 0
+    ) {
+      throw new BadRequestException('Invalid images array');
+    }
+
+    for (const img of data.images) {
+      if (!img.image_source) {
+        throw new BadRequestException(
+          'Each image must have an image_source (S3 key)',
+        );
+      }
+    }
+
+    return this.aiService.submitBulkEmbedJob(data);
+  }
+
+  @Post('reembed/jobs')
+  async submitReembedJob(
+    @Body() data: { model: string; source_model?: string },
+  ) {
+    if (!data.model) {
+      throw new BadRequestException('model is required');
+    }
+    return this.aiService.submitReembedJob(data);
+  }
+
+  @Get('bulk-embed/jobs/:id')
+  async getBulkEmbedJob(
+    @Param('id') id: string,
+    @Query('results') results?: string,
+    @Query('offset') offset?: string,
+    @Query('limit') limit?: string,
+  ) {
+    return this.aiService.getBulkEmbedJob(id, {
+      ...(results !== undefined && { results: results === 'true' }),
+      ...(offset !== undefined && { offset: parseInt(offset, 10) }),
+      ...(limit !== undefined && { limit: parseInt(limit, 10) }),
+    });
+  }
+
+  @Post('bulk-embed/jobs/:id/cancel')
+  async cancelBulkEmbedJob(@Param('id') id: string) {
+    return this.aiService.cancelBulkEmbedJob(id);
+  }
+
   @Post('search/image')
   @UseInterceptors(FileInterceptor('image'))
   async searchByImage(
     @UploadedFile() file: Express.Multer.File,
     @Query('top_k') topK: string = '5',
+    @Query('type') type?: string,
+    @Query('country') country?: string,
+    @Query('inService') inService?: string,
+    @Query('yearMin') yearMin?: string,
+    @Query('yearMax') yearMax?: string,
+    @Query('group_by') groupBy?: SearchGrouping['group_by'],
+    @Query('group_score') groupScore?: SearchGrouping['group_score'],
+    @Query('model') model?: string,
   ) {
     if (!file) {
       throw new BadRequestException('No image file provided');
@@ -155,13 +226,25 @@ export class AiController {
     return this.aiService.searchBySimilarImage({
       image_source: s3Key,
       top_k: parseInt(topK, 10),
+      filters: this.parseSearchFilters({
+        type,
+        country,
+        inService,
+        yearMin,
+        yearMax,
+      }),
+      grouping: { group_by: groupBy, group_score: groupScore },
+      model,
     });
   }
 
   @Post('search/text')
   async searchByText(
-    @Body() data: { text_query: string },
+    @Body()
+    data: { text_query: string; filters?: SearchFilters; model?: string },
     @Query('top_k') topK: string = '5',
+    @Query('group_by') groupBy?: SearchGrouping['group_by'],
+    @Query('group_score') groupScore?: SearchGrouping['group_score'],
   ) {
     if (!data.text_query) {
       throw new BadRequestException('Text query is required');
@@ -169,6 +252,76 @@ export class AiController {
     return this.aiService.searchByText({
       text_query: data.text_query,
       top_k: parseInt(topK, 10),
+      filters: data.filters,
+      grouping: { group_by: groupBy, group_score: groupScore },
+      model: data.model,
     });
   }
+
+  @Get('search/results/:id')
+  async getSearchResults(
+    @Param('id') id: string,
+    @Query('offset') offset: string = '0',
+    @Query('limit') limit: string = '20',
+  ) {
+    return this.aiService.getSearchResults(
+      id,
+      parseInt(offset, 10),
+      parseInt(limit, 10),
+    );
+  }
+
+  @Post('search/batch')
+  async searchBatch(
+    @Body()
+    data: {
+      queries: Array<{
+        query_type: 'image' | 'text';
+        image_source?: string;
+        text_query?: string;
+        filters?: SearchFilters;
+        model?: string;
+      }>;
+      filters?: SearchFilters;
+      model?: string;
+    },
+    @Query('top_k') topK: string = '5',
+  ) {
+    if (!Array.isArray(data.queries) || !data.queries.length) {
+      throw new BadRequestException('queries must be a non-empty array');
+    }
+    return this.aiService.searchBatch({
+      queries: data.queries,
+      top_k: parseInt(topK, 10),
+      filters: data.filters,
+      model: data.model,
+    });
+  }
+
+  // Фільтри з query-параметрів (для multipart-запиту з зображенням)
+  private parseSearchFilters(query: {
+    type?: string;
+    country?: string;
+    inService?: string;
+    yearMin?: string;
+    yearMax?: string;
+  }): SearchFilters | undefined {
+    const filters: SearchFilters = {};
+    if (query.type) {
+      filters.type = query.type.split(',');
+    }
+    if (query.country) {
+      filters.country = query.country.split(',');
+    }
+    if (query.inService !== undefined) {
+      filters.inService = query.inService === 'true';
+    }
+    if (query.yearMin || query.yearMax) {
+      filters.year = {
+        min: query.yearMin ? parseInt(query.yearMin, 10) : undefined,
+        max: query.yearMax ? parseInt(query.yearMax, 10) : undefined,
+      };
+    }
+    return Object.keys(filters).length ? filters : undefined;
+  }
 }
@@ -3,6 +3,20 @@ import { HttpService } from '@nestjs/axios';
 import { ConfigService } from '@nestjs/config';
 import { firstValueFrom } from 'rxjs';
 
+// Фільтри пошуку застосовуються в Python-сервісі до вибору top_k
+export interface SearchFilters {
+  type?: string | string[];
+  country?: string | string[];
+  inService?: boolean;
+  year?: number | { min?: number; max?: number };
+}
+
+// Групування результатів: кожна одиниця техніки один раз
+export interface SearchGrouping {
+  group_by?: 'equipment';
+  group_score?: 'max' | 'mean' | 'centroid';
+}
+
 @Injectable()
 export class AiService {
   private readonly pythonServiceUrl: string;
@@ -64,7 +78,12 @@ export class AiService {
     }
   }
 
-  async createEmbedding(data: { image_source: string; metadata?: any }) {
+  // model: модель CLIP (за замовчуванням CLIP_MODEL Python-сервісу)
+  async createEmbedding(data: {
+    image_source: string;
+    metadata?: any;
+    model?: string;
+  }) {
     try {
       // Валідація даних
       if (!data.image_source) {
@@ -93,6 +112,7 @@ export class AiService {
 
   async bulkEmbed(data: {
     images: Array<{ image_source: string; metadata?: any; image_id?: string }>;
+    model?: string;
   }) {
     try {
       // Валідація даних
@@ -123,7 +143,110 @@ export class AiService {
     }
   }
 
-  async searchBySimilarImage(data: { image_source: string; top_k?: number }) {
+  // Фонова задача: Python-сервіс одразу повертає job_id, прогрес читається через getBulkEmbedJob
+  async submitBulkEmbedJob(data: {
+    images: Array<{ image_source: string; metadata?: any; image_id?: string }>;
+    skip_duplicates?: boolean;
+    model?: string;
+  }) {
+    try {
+      if (
+        !data.images ||
+        !Array.isArray(data.images) ||
+        data.images.length === 0
+      ) {
+        throw new HttpException(
+          'Valid images array is required',
+          HttpStatus.BAD_REQUEST,
+        );
+      }
+
+      console.log(`Submitting bulk embed job for ${data.images.length} images`);
+      const response = await firstValueFrom(
+        this.httpService.post(
+          `${this.pythonServiceUrl}/api/bulk-embed/jobs`,
+          data,
+        ),
+      );
+      return response.data;
+    } catch (error) {
+      console.error(
+        'Error submitting bulk embed job:',
+        error.response?.data || error.message,
+      );
+      throw this.handleHttpError(error);
+    }
+  }
+
+  // Переносить корпус на іншу модель; прогрес - через getBulkEmbedJob, стара модель тим часом обслуговує пошук
+  async submitReembedJob(data: { model: string; source_model?: string }) {
+    try {
+      if (!data.model) {
+        throw new HttpException('model is required', HttpStatus.BAD_REQUEST);
+      }
+
+      console.log(`Submitting re-embed job for model ${data.model}`);
+      const response = await firstValueFrom(
+        this.httpService.post(
+          `${this.pythonServiceUrl}/api/reembed/jobs`,
+          data,
+        ),
+      );
+      return response.data;
+    } catch (error) {
+      console.error(
+        'Error submitting re-embed job:',
+        error.response?.data || error.message,
+      );
+      throw this.handleHttpError(error);
+    }
+  }
+
+  async getBulkEmbedJob(
+    jobId: string,
+    options: { results?: boolean; offset?: number; limit?: number } = {},
+  ) {
+    try {
+      const response = await firstValueFrom(
+        this.httpService.get(
+          `${this.pythonServiceUrl}/api/bulk-embed/jobs/${encodeURIComponent(jobId)}`,
+          { params: options },
+        ),
+      );
+      return response.data;
+    } catch (error) {
+      console.error(
+        'Error getting bulk embed job:',
+        error.response?.data || error.message,
+      );
+      throw this.handleHttpError(error);
+    }
+  }
+
+  async cancelBulkEmbedJob(jobId: string) {
+    try {
+      const response = await firstValueFrom(
+        this.httpService.post(
+          `${this.pythonServiceUrl}/api/bulk-embed/jobs/${encodeURIComponent(jobId)}/cancel`,
+        ),
+      );
+      return response.data;
+    } catch (error) {
+      console.error(
+        'Error cancelling bulk embed job:',
+        error.response?.data || error.message,
+      );
+      throw this.handleHttpError(error);
+    }
+  }
+
+  async searchBySimilarImage(data: {
+    image_source: string;
+    top_k?: number;
+    filters?: SearchFilters;
+    grouping?: SearchGrouping;
+    model?: string;
+  }) {
     try {
       // Валідація даних
       if (!data.image_source) {
@@ -137,6 +260,9 @@ export class AiService {
         query_type: 'image',
         image_source: data.image_source,
         top_k: data.top_k || 5,
+        filters: data.filters,
+        model: data.model,
+        ...data.grouping,
       };
 
       console.log('Searching by image with S3 key:', data.image_source);
@@ -156,7 +282,13 @@ export class AiService {
     }
   }
 
-  async searchByText(data: { text_query: string; top_k?: number }) {
+  async searchByText(data: {
+    text_query: string;
+    top_k?: number;
+    filters?: SearchFilters;
+    grouping?: SearchGrouping;
+    model?: string;
+  }) {
     try {
       // Валідація даних
       if (!data.text_query) {
@@ -170,6 +302,9 @@ export class AiService {
         query_type: 'text',
         text_query: data.text_query,
         top_k: data.top_k || 5,
+        filters: data.filters,
+        model: data.model,
+        ...data.grouping,
       };
 
       console.log('Searching by text query:', data.text_query);
@@ -189,6 +324,62 @@ export class AiService {
     }
   }
 
+  async getSearchResults(resultSetId: string, offset = 0, limit = 20) {
+    try {
+      const response = await firstValueFrom(
+        this.httpService.get(
+          `${this.pythonServiceUrl}/api/search/results/${encodeURIComponent(resultSetId)}`,
+          { params: { offset, limit } },
+        ),
+      );
+      return response.data;
+    } catch (error) {
+      console.error(
+        'Error getting search results page:',
+        error.response?.data || error.message,
+      );
+      throw this.handleHttpError(error);
+    }
+  }
+
+  async searchBatch(data: {
+    queries: Array<{
+      query_type: 'image' | 'text';
+      image_source?: string;
+      text_query?: string;
+      filters?: SearchFilters;
+      model?: string;
+    }>;
+    top_k?: number;
+    filters?: SearchFilters;
+    model?: string;
+  }) {
+    try {
+      if (!data.queries?.length) {
+        throw new HttpException(
+          'queries must be a non-empty array',
+          HttpStatus.BAD_REQUEST,
+        );
+      }
+
+      const response = await firstValueFrom(
+        this.httpService.post(`${this.pythonServiceUrl}/api/search/batch`, {
+          queries: data.queries,
+          top_k: data.top_k || 5,
+          filters: data.filters,
+          model: data.model,
+        }),
+      );
+      return response.data;
+    } catch (error) {
+      console.error(
+        'Error in batch search:',
+        error.response?.data || error.message,
+      );
+      throw this.handleHttpError(error);
+    }
+  }
+
   // Utility method for handling HTTP errors
   private handleHttpError(error: any) {
     if (error.response?.data) {
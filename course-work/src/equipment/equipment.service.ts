@@ -171,9 +171,10 @@ export class EquipmentService {
         },
       }));
 
-      await this.aiService.bulkEmbed({ images });
+      // Великі пакети обробляються фоновою задачею, щоб HTTP-запит не впирався в таймаут
+      const job = await this.aiService.submitBulkEmbedJob({ images });
       console.log(
-        `Bulk embeddings created for ${equipment.length} equipment items`,
+        `Bulk embedding job ${job.job_id} queued for ${equipment.length} equipment items`,
       );
     } catch (error) {
       console.error('Failed to create bulk embeddings:', error);